@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+import polars as pl
+import pyarrow as pa
+
+from mimicry.models import TableConfiguration
+
+logger = logging.getLogger(__name__)
+
+# part of the keys, so batches cached in a previous format are not read
+CACHE_FORMAT_VERSION = 2
+
+
+class BatchCache:
+    """Content-addressed cache of generated batches on the local disk.
+
+    Every batch is stored as an uncompressed Arrow IPC file named after the hash of
+    everything that determines its data: the table configuration (including its
+    seed), the number of records, the index of the batch and the shard size. Hence
+    only batches of seeded tables can be cached. The batches are stored before the
+    nulls, outliers and duplicates are injected, which are derived from the seed.
+    The files are memory-mapped when read, so reading a cached batch costs little
+    more than the I/O.
+    """
+
+    def __init__(self, directory: str | os.PathLike) -> None:
+        """Initialize the cache.
+
+        Args:
+            directory (str | os.PathLike): The directory the batches are stored in.
+                It is created if it does not exist.
+
+        """
+        self.directory = pathlib.Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def key(
+        self,
+        table: TableConfiguration,
+        count: int,
+        batch_idx: int,
+        shard_size: int,
+    ) -> str:
+        """Compute the key of a batch.
+
+        Args:
+            table (TableConfiguration): The table configuration.
+            count (int): The number of records of the batch.
+            batch_idx (int): The index of the batch.
+            shard_size (int): The maximum number of records per shard.
+
+        Returns:
+            str: The key of the batch.
+
+        Raises:
+            ValueError: If the table has no seed.
+
+        """
+        if table.seed is None:
+            raise ValueError(
+                f"Batches of table '{table.name}' cannot be cached without a seed."
+            )
+        content = json.dumps(
+            [
+                CACHE_FORMAT_VERSION,
+                table.model_dump(mode="json"),
+                count,
+                batch_idx,
+                shard_size,
+            ],
+            sort_keys=True,
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> pathlib.Path:
+        """The path of the file of a cached batch."""
+        return self.directory / f"{key}.arrow"
+
+    def __contains__(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    def get(self, key: str) -> pl.DataFrame | None:
+        """Read a cached batch.
+
+        Args:
+            key (str): The key of the batch.
+
+        Returns:
+            pl.DataFrame | None: The memory-mapped batch, or None if it is not cached.
+
+        """
+        path = self.path(key)
+        if not path.exists():
+            return None
+        logger.debug("Reading cached batch from '%s'.", path)
+        return pl.read_ipc(path, memory_map=True, rechunk=False)
+
+    def count_batches(
+        self,
+        table: TableConfiguration,
+        count: int,
+        shard_size: int,
+        first_idx: int = 1,
+    ) -> int:
+        """Count the consecutive cached batches of a stream.
+
+        Args:
+            table (TableConfiguration): The table configuration.
+            count (int): The number of records per batch.
+            shard_size (int): The maximum number of records per shard.
+            first_idx (int): The index of the first batch of the stream.
+
+        Returns:
+            int: The number of batches cached from `first_idx` on.
+
+        Raises:
+            ValueError: If the table has no seed.
+
+        """
+        batch_idx = first_idx
+        while self.key(table, count, batch_idx, shard_size) in self:
+            batch_idx += 1
+        return batch_idx - first_idx
+
+    @contextmanager
+    def writer(self, key: str) -> Iterator[Callable[[pl.DataFrame], None]]:
+        """Write a batch to the cache shard by shard.
+
+        The batch is written to a temporary file that replaces the cached file only
+        if the block exits without an error, so a partially written batch is never
+        read from the cache.
+
+        Args:
+            key (str): The key of the batch.
+
+        Yields:
+            Callable[[pl.DataFrame], None]: The function to write a shard with.
+
+        """
+        path = self.path(key)
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        writer: pa.RecordBatchFileWriter | None = None
+
+        def write(data: pl.DataFrame) -> None:
+            nonlocal writer
+            table = data.to_arrow()
+            if writer is None:
+                writer = pa.ipc.new_file(str(tmp_path), table.schema)
+            writer.write_table(table)
+
+        try:
+            yield write
+            if writer is not None:
+                writer.close()
+                writer = None
+                os.replace(tmp_path, path)
+                logger.debug("Cached batch in '%s'.", path)
+        finally:
+            if writer is not None:
+                writer.close()
+            tmp_path.unlink(missing_ok=True)
+
+
+__all__ = ["BatchCache"]
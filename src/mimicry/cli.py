@@ -2,8 +2,10 @@ import uvicorn
 
 import typer
 
-from mimicry.core import load_sink_config, load_table_config
+from mimicry.cache import BatchCache
+from mimicry.core import load_job_config, load_sink_config, load_table_config
 from mimicry.data import stream_data
+from mimicry.jobs import run_job
 from mimicry.server import build_fastapi_app
 
 
@@ -19,8 +21,11 @@ def generate(
     schema_path: str = typer.Option(
         ..., "-p", "--schema", help="Schema configuration path"
     ),
-    interval: int = typer.Option(
-        ..., "-i", "--interval", help="Interval in seconds between generating batches."
+    interval: float | None = typer.Option(
+        None,
+        "-i",
+        "--interval",
+        help="Interval in seconds between the starts of consecutive batches. Can be a fraction of a second.",
     ),
     count: int = typer.Option(
         ...,
@@ -40,22 +45,106 @@ def generate(
         "--strict",
         help="If True, will raise an error if the schema is not valid. If False, will log a warning.",
     ),
+    workers: int = typer.Option(
+        1,
+        "-w",
+        "--workers",
+        help="Number of processes used to generate each batch. Batches are split into shards of 100,000 rows (or --chunk-rows), so only batches of several shards are generated in parallel.",
+    ),
+    seed: int | None = typer.Option(
+        None,
+        "--seed",
+        help="Seed for reproducible data generation. Overrides the seed of the schema.",
+    ),
+    chunk_rows: int | None = typer.Option(
+        None,
+        "--chunk-rows",
+        help="If set, each batch is generated and appended in chunks of at most this many rows to bound memory usage. The chunks are the shards generated in parallel by the workers, and the seeded data depends on their size.",
+    ),
+    queue_depth: int = typer.Option(
+        0,
+        "-q",
+        "--queue-depth",
+        help="If > 0, batches are generated in the background while the previous ones are written, with at most this many batches (or chunks) waiting to be written.",
+    ),
+    rows_per_second: float | None = typer.Option(
+        None,
+        "-r",
+        "--rows-per-second",
+        help="Target rate of rows per second. Batches of --count rows are scheduled accordingly, instead of every --interval seconds.",
+    ),
+    cache_dir: str | None = typer.Option(
+        None,
+        "--cache-dir",
+        envvar="MIMICRY_CACHE_DIR",
+        help="Directory of the cache of generated batches. If set, batches of seeded schemas are read from the cache instead of generated, and cached otherwise.",
+    ),
+    replay: bool = typer.Option(
+        False,
+        "--replay",
+        help="If True, replays the cached batches of the schema, in a loop, instead of generating new ones. Requires --cache-dir.",
+    ),
 ) -> None:
     """
     Generate and stream data based on the provided configuration.
     This command will read the schema and sink configurations, then stream data
     according to the specified parameters.
     """
+    if (interval is None) == (rows_per_second is None):
+        raise typer.BadParameter(
+            "Exactly one of --interval and --rows-per-second must be provided."
+        )
+    if replay and cache_dir is None:
+        raise typer.BadParameter("--replay requires --cache-dir.")
+
+    table = load_table_config(schema_path)
+    if seed is not None:
+        table = table.model_copy(update={"seed": seed})
+
     stream_data(
-        table=load_table_config(schema_path),
+        table=table,
         count=count,
         num_of_batches=batches,
-        interval=interval,
+        interval=interval or 0.0,
         sink=load_sink_config(sink_path),
         strict=strict,
+        workers=workers,
+        chunk_rows=chunk_rows,
+        queue_depth=queue_depth,
+        rows_per_second=rows_per_second,
+        cache=BatchCache(cache_dir) if cache_dir is not None else None,
+        replay=replay,
     )
 
 
+@app.command(no_args_is_help=True)
+def run(
+    job_path: str = typer.Option(..., "-j", "--job", help="Job configuration path"),
+    strict: bool = typer.Option(
+        False,
+        "-x",
+        "--strict",
+        help="If True, will raise an error if any schema is not valid. If False, will log a warning.",
+    ),
+    workers: int | None = typer.Option(
+        None,
+        "-w",
+        "--workers",
+        help="Number of processes shared by all streams to generate batches. Overrides the workers of the job.",
+    ),
+) -> None:
+    """
+    Generate and stream data for multiple tables and sinks concurrently.
+    This command will read the job configuration and run all of its streams
+    in a single process, sharing the pool of generation workers.
+    """
+    job = load_job_config(job_path)
+    if workers is not None:
+        job = job.model_copy(update={"workers": workers})
+
+    run_job(job=job, strict=strict)
+
+
 @app.command(no_args_is_help=True)
 def serve(
     name: str = typer.Option(
@@ -97,6 +186,12 @@ def serve(
     max_count: int = typer.Option(
         1000, "-m", "--max-count", help="Maximum number of rows to return per request"
     ),
+    cache_dir: str | None = typer.Option(
+        None,
+        "--cache-dir",
+        envvar="MIMICRY_CACHE_DIR",
+        help="Directory of the cache of generated batches, used for seeded schemas.",
+    ),
 ):
     """
     Serve the Mimicry API with the provided schema configurations.
@@ -112,6 +207,7 @@ def serve(
         description=description,
         version=version,
         max_count=max_count,
+        cache=BatchCache(cache_dir) if cache_dir is not None else None,
     )
 
     uvicorn.run(app, host=host, port=port)
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import yaml
 
-from mimicry.models import SinkConfiguration, TableConfiguration
+from mimicry.models import JobConfiguration, SinkConfiguration, TableConfiguration
 from mimicry.filesystem import read_text
 
 logger = logging.getLogger(__name__)
@@ -35,3 +35,17 @@ def load_sink_config(file_path: str | Path) -> SinkConfiguration:
     """
     content = read_text(path=file_path)
     return SinkConfiguration(**yaml.safe_load(content))
+
+
+def load_job_config(file_path: str | Path) -> JobConfiguration:
+    """Load the job configuration from a YAML file.
+
+    Args:
+        file_path (str | Path): The path to the YAML file.
+
+    Returns:
+        JobConfiguration: The loaded job configuration.
+
+    """
+    content = read_text(path=file_path)
+    return JobConfiguration(**yaml.safe_load(content))
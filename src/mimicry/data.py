@@ -1,233 +1,177 @@
-import json
 import logging
-import os
-import time
-from collections.abc import Callable
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
 
-from kafka import KafkaProducer as Producer
-
-import duckdb
 import polars as pl
-from deltalake import DeltaTable
-from mimesis import Fieldset, Locale
-from pyiceberg.catalog import load_catalog
-
-from mimicry.exceptions import (
-    MimicryInvalidCountValueError,
-    MimicryInvalidFieldConfigurationError,
-)
-from mimicry.models import (
-    DeltaLakeSinkConfiguration,
-    DuckDBSinkConfiguration,
-    IcebergSinkConfiguration,
-    KafkaSinkConfiguration,
-    PostgresSinkConfiguration,
-    SinkConfiguration,
-    TableConfiguration,
-)
-
-logger = logging.getLogger(__name__)
 
+from mimicry.cache import BatchCache
+from mimicry.generator import DEFAULT_SHARD_SIZE, TableGenerator, split_count
+from mimicry.keys import KeyRegistry
+from mimicry.models import SinkConfiguration, TableConfiguration
+from mimicry.scheduler import RateScheduler
+from mimicry.sinks import Batch, open_sink_session
+from mimicry.utils import prefetch
 
-def does_duckdb_table_exist(conn: duckdb.DuckDBPyConnection, table_name: str) -> bool:
-    try:
-        conn.table(table_name=table_name)
-        return True
-    except duckdb.CatalogException:
-        return False
+logger = logging.getLogger(__name__)
 
 
-def prepare_mimesis_schema(
+def generate_data(
     table: TableConfiguration,
     count: int,
     strict: bool,
-) -> Callable:
-    results = {}
-    try:
-        locale = getattr(Locale, table.locale.upper())
-    except AttributeError:
-        logger.warning("Locale '%s' not found. Defaulting to English.", table.locale)
-        locale = Locale.EN
-
-    fs = Fieldset(
-        locale=locale,
-        i=count,
-    )
-
-    try:
-        count = int(count)
-        assert count > 0, "Count must be a positive integer."
-    except (ValueError, AssertionError):
-        raise MimicryInvalidCountValueError(count=count)
-
-    for field in table.fields:
-        try:
-            results[field.name] = fs(
-                field.mimesis_field_name,
-                *field.mimesis_field_args,
-                **field.mimesis_field_kwargs,
-            )
-        except Exception as e:
-            if strict:
-                raise MimicryInvalidFieldConfigurationError(field=field, exception=e)
-            logger.warning(
-                "Failed to generate data for field '%s': %s. Skipping this field.",
-                field.name,
-                e,
-            )
-            continue
-
-    return lambda: results
-
-
-def generate_data(table: TableConfiguration, count: int, strict: bool) -> pl.DataFrame:
+    workers: int = 1,
+    cache: BatchCache | None = None,
+) -> pl.DataFrame:
     """Generate data for a table configuration.
 
     Args:
         table (TableConfiguration): The table configuration.
         count (int): The number of records to generate.
         strict (bool): If True, raises an error if the table configuration is invalid.
+        workers (int): The number of processes to generate the data with.
+        cache (BatchCache | None): The cache of generated batches. If the data of a
+            seeded table is cached, it is read instead of generated.
 
     Returns:
         pl.DataFrame: A DataFrame representing the generated data.
 
     """
-    schema = prepare_mimesis_schema(table=table, count=count, strict=strict)
-    results = pl.DataFrame(schema())
-    logger.info(
-        "Generated %d records for table '%s' with schema:\n%s",
-        count,
-        table.name,
-        json.dumps(results.schema, indent=4, default=str),
-    )
-    logger.debug(
-        "Head of the generated data for table '%s':\n%s",
-        table.name,
-        results.head(5),  # Show only the first 5 records for debugging
-    )
-    return pl.DataFrame(schema())
+    with TableGenerator(
+        table=table, strict=strict, workers=workers, cache=cache
+    ) as generator:
+        return generator.generate(count=count)
 
 
-def append_to_delta(
-    config: DeltaLakeSinkConfiguration,
-    data: pl.DataFrame,
-    batch_idx: int,
-) -> None:
-    data.write_delta(target=config.path, mode="append")
-    if config.vacuum is not None and batch_idx % config.vacuum == 0:
-        logger.info(
-            "Vacuuming Delta Lake table at '%s' after batch %d",
-            config.path,
-            batch_idx,
-        )
-        table = DeltaTable(config.path)
-        table.vacuum()
+def iter_batches(
+    table: TableConfiguration,
+    total_rows: int,
+    chunk_rows: int,
+    strict: bool = False,
+    workers: int = 1,
+    cache: BatchCache | None = None,
+) -> Iterator[pl.DataFrame]:
+    """Generate data for a table configuration in chunks with bounded memory.
 
-    if config.optimize is not None and batch_idx % config.optimize == 0:
-        logger.info(
-            "Optimizing Delta Lake table at '%s' after batch %d",
-            config.path,
-            batch_idx,
-        )
-        table = DeltaTable(config.path)
-        table.optimize.compact()
+    Args:
+        table (TableConfiguration): The table configuration.
+        total_rows (int): The total number of records to generate.
+        chunk_rows (int): The maximum number of records per chunk.
+        strict (bool): If True, raises an error if the table configuration is invalid.
+        workers (int): The number of processes to generate the chunks with.
+        cache (BatchCache | None): The cache of generated batches. If the data of a
+            seeded table is cached, it is read instead of generated.
 
+    Yields:
+        pl.DataFrame: The chunks of the generated data. Only `workers` chunks are
+            held in memory at once, regardless of `total_rows`.
 
-def append_to_duckdb(config: DuckDBSinkConfiguration, data: pl.DataFrame) -> None:
-    MIMICRY_UNSAFE_DUCKDB = (
-        os.environ.get("MIMICRY_UNSAFE_DUCKDB", "FALSE").upper() == "TRUE"
-    )
-    with duckdb.connect(config.path) as conn:
-        if MIMICRY_UNSAFE_DUCKDB and not does_duckdb_table_exist(
-            conn=conn, table_name=config.table_name
-        ):
-            logger.warning(
-                'MIMICRY_UNSAFE_DUCKDB environment variable set to true. DuckDB table name: "%s" is not sanitized, hence it might result in the SQL injection attack.',
-                config.table_name,
-            )
-            create_table_query = f"CREATE TABLE IF NOT EXISTS {config.table_name} AS SELECT * FROM data LIMIT 0"
-            conn.execute(create_table_query)
-        # TECH DEBT: to safely append data to the DuckDB table we use append method that supports only pandas DataFrame.
-        # it raises the CatalogException if table is not created before the ingestion
-        conn.append(config.table_name, data.to_pandas())
+    """
+    with TableGenerator(
+        table=table,
+        strict=strict,
+        workers=workers,
+        shard_size=chunk_rows,
+        cache=cache,
+    ) as generator:
+        yield from generator.iter_shards(count=total_rows)
 
 
-def append_to_postgres(
-    config: PostgresSinkConfiguration, data: pl.DataFrame, batch_idx: int
-) -> None:
-    data.write_database(
-        connection=config.connection_string,
-        table_name=config.table_name,
-        if_table_exists="append",
-        engine="sqlalchemy",
-    )
+def is_stream_active(idx: int, num_of_batches: int) -> bool:
+    return idx <= num_of_batches if num_of_batches > 0 else True
 
 
-def append_to_iceberg(
-    config: IcebergSinkConfiguration, data: pl.DataFrame, batch_idx: int
-) -> None:
-    catalog = load_catalog(
-        "main",
-        **config.catalog_properties,
-    )
-    if not catalog.table_exists(config.table_name):
-        catalog.create_table(
-            identifier=config.table_name,
-            schema=data.to_arrow().schema,
-        )
-    table = catalog.load_table(config.table_name)
-    table.append(data.to_arrow())
+def iter_stream_chunks(
+    generator: TableGenerator,
+    count: int,
+    num_of_batches: int,
+    chunk_rows: int | None,
+    replay_batches: int | None = None,
+) -> Iterator[tuple[int, pl.DataFrame, bool]]:
+    """Generate the batches of a stream.
 
+    Args:
+        generator (TableGenerator): The compiled generator for the table.
+        count (int): The number of records per batch.
+        num_of_batches (int): The number of batches. If <= 0, batches are generated indefinitely.
+        chunk_rows (int | None): If set, each batch is generated in chunks of at most this many records.
+        replay_batches (int | None): If set, the stream cycles through the data of this many
+            first batches, e.g. the batches stored in the cache.
 
-def append_to_kafka(
-    config: KafkaSinkConfiguration, data: pl.DataFrame, batch_idx: int
-) -> None:
-    producer = Producer(**config.producer_config)
-    topic = config.topic
-    items = data.write_ndjson()
-
-    for item in items.splitlines():
-        producer.send(topic, value=item.encode("utf-8"))
-
-    producer.flush()
-    producer.close()
-
-
-def append_to_sink(sink: SinkConfiguration, data: pl.DataFrame, batch_idx: int) -> None:
-    match sink.configuration.type_of_sink:
-        case "delta_lake":
-            append_to_delta(config=sink.configuration, data=data, batch_idx=batch_idx)
-        case "duckdb":
-            append_to_duckdb(config=sink.configuration, data=data)
-        case "postgres":
-            append_to_postgres(
-                config=sink.configuration, data=data, batch_idx=batch_idx
-            )
-        case "iceberg":
-            append_to_iceberg(config=sink.configuration, data=data, batch_idx=batch_idx)
-        case "kafka":
-            append_to_kafka(config=sink.configuration, data=data, batch_idx=batch_idx)
-        case _:
-            raise ValueError(
-                f"Unsupported sink type: {sink.configuration.type_of_sink}",
-            )
+    Yields:
+        tuple[int, pl.DataFrame, bool]: The batch index, the data and whether it is the last chunk of the batch.
 
+    """
+    idx = 1
+    while is_stream_active(idx, num_of_batches):
+        batch_idx = idx if replay_batches is None else (idx - 1) % replay_batches + 1
+        if chunk_rows is None:
+            yield idx, generator.generate(count=count, batch_idx=batch_idx), True
+        else:
+            num_of_chunks = len(split_count(count, chunk_rows))
+            chunks = generator.iter_shards(count=count, batch_idx=batch_idx)
+            for chunk_idx, data in enumerate(chunks, start=1):
+                yield idx, data, chunk_idx == num_of_chunks
+        idx += 1
 
-def is_stream_active(idx: int, num_of_batches: int) -> bool:
-    return idx <= num_of_batches if num_of_batches > 0 else True
+
+def count_replay_batches(generator: TableGenerator, count: int) -> int:
+    """Count the cached batches a stream can replay.
+
+    Args:
+        generator (TableGenerator): The compiled generator for the table.
+        count (int): The number of records per batch.
+
+    Returns:
+        int: The number of consecutive cached batches, from the first one on.
+
+    Raises:
+        ValueError: If the generator has no cache or no batch is cached.
+
+    """
+    if generator.cache is None:
+        raise ValueError(
+            f"Replaying table '{generator.table.name}' requires a cache and a seeded table without references."
+        )
+    replay_batches = generator.cache.count_batches(
+        table=generator.table,
+        count=count,
+        shard_size=generator.shard_size,
+    )
+    if replay_batches == 0:
+        raise ValueError(
+            f"No cached batches of {count} records found for table '{generator.table.name}'. "
+            "Generate them with the cache enabled first."
+        )
+    return replay_batches
 
 
 def stream_data(
     table: TableConfiguration,
     count: int,
-    interval: int,
+    interval: float,
     num_of_batches: int,
     sink: SinkConfiguration,
     strict: bool = False,
+    workers: int = 1,
+    chunk_rows: int | None = None,
+    queue_depth: int = 0,
+    rows_per_second: float | None = None,
+    executor: ProcessPoolExecutor | None = None,
+    registry: KeyRegistry | None = None,
+    cache: BatchCache | None = None,
+    replay: bool = False,
+    stop: threading.Event | None = None,
 ) -> None:
-    idx = 1
+    if rows_per_second is not None:
+        if rows_per_second <= 0:
+            raise ValueError(
+                f"Invalid rows per second: {rows_per_second}. It must be positive."
+            )
+        interval = count / rows_per_second
+
     logger.info(
-        "Starting data streaming for table '%s' with %d records per batch, every %d seconds.",
+        "Starting data streaming for table '%s' with %d records per batch, every %.3f seconds.",
         table.name,
         count,
         interval,
@@ -235,46 +179,106 @@ def stream_data(
 
     logger.info("Table configuration: %s", table.model_dump_json(indent=4))
 
-    while is_stream_active(idx, num_of_batches):
-        data = generate_data(table=table, count=count, strict=strict)
+    shard_size = chunk_rows or DEFAULT_SHARD_SIZE
+    if executor is None and workers > 1 and count <= shard_size:
+        logger.warning(
+            "Batches of %d records fit in a single shard of %d records, so they are generated by 1 of the %d workers. Set chunk_rows to split them across the workers.",
+            count,
+            shard_size,
+            workers,
+        )
 
-        if num_of_batches > 0:
-            logger.info(
-                "Generated %d records for table '%s' in batch %d/%d",
-                count,
-                table.name,
-                idx,
-                num_of_batches,
-            )
-        else:
+    with TableGenerator(
+        table=table,
+        strict=strict,
+        workers=workers,
+        shard_size=shard_size,
+        executor=executor,
+        registry=registry,
+        cache=cache,
+    ) as generator:
+        replay_batches = None
+        if replay:
+            replay_batches = count_replay_batches(generator=generator, count=count)
             logger.info(
-                "Generated %d records for table '%s' in batch %d (until stopped)",
-                count,
+                "Replaying %d cached batch(es) of table '%s'.",
+                replay_batches,
                 table.name,
-                idx,
             )
 
-        append_to_sink(sink=sink, data=data, batch_idx=idx)
-
-        if num_of_batches == 1:
-            logger.info(
-                "Single batch completed. Exiting after appending %d records to sink of type '%s'.",
-                count,
-                sink.configuration.type_of_sink,
-            )
-            return
+        chunks = iter_stream_chunks(
+            generator=generator,
+            count=count,
+            num_of_batches=num_of_batches,
+            chunk_rows=chunk_rows,
+            replay_batches=replay_batches,
+        )
+        if queue_depth > 0:
+            # the next batches are generated while the current one is written
+            chunks = prefetch(chunks, depth=queue_depth)
+
+        with open_sink_session(sink) as session:
+            scheduler = RateScheduler(interval=interval)
+            appended = 0
+
+            for idx, data, is_last_chunk in chunks:
+                session.write(Batch(data=data, idx=idx))
+                appended += data.height
+
+                if not is_last_chunk:
+                    continue
+
+                session.flush()
+
+                if num_of_batches > 0:
+                    logger.info(
+                        "Generated %d records for table '%s' in batch %d/%d",
+                        count,
+                        table.name,
+                        idx,
+                        num_of_batches,
+                    )
+                else:
+                    logger.info(
+                        "Generated %d records for table '%s' in batch %d (until stopped)",
+                        count,
+                        table.name,
+                        idx,
+                    )
+
+                if num_of_batches == 1:
+                    logger.info(
+                        "Single batch completed. Exiting after appending %d records to sink of type '%s'.",
+                        count,
+                        sink.configuration.type_of_sink,
+                    )
+                    return
+
+                logger.info(
+                    "Appended %d records to sink of type '%s' in batch %d.",
+                    count,
+                    sink.configuration.type_of_sink,
+                    idx,
+                )
+
+                if not is_stream_active(idx + 1, num_of_batches):
+                    break
+
+                if not scheduler.wait(stop):
+                    logger.info(
+                        "Stopping the stream of table '%s' after batch %d.",
+                        table.name,
+                        idx,
+                    )
+                    break
 
         logger.info(
-            "Appended %d records to sink of type '%s' in batch %d. Waiting for %d seconds before next batch.",
-            count,
-            sink.configuration.type_of_sink,
-            idx,
-            interval,
+            "Streaming completed. Appended %d records in %.3f seconds, max lag %.3f seconds, %d dropped tick(s).",
+            appended,
+            scheduler.elapsed(),
+            scheduler.max_lag,
+            scheduler.dropped_ticks,
         )
 
-        time.sleep(interval)
-
-        idx += 1
-
 
-__all__ = ["stream_data", "generate_data"]
+__all__ = ["stream_data", "generate_data", "iter_batches"]
@@ -0,0 +1,56 @@
+import ast
+import re
+from collections.abc import Sequence
+
+import polars as pl
+
+_DTYPE_PATTERN = re.compile(r"(?P<name>\w+)(?:\((?P<args>.*)\))?")
+
+
+def parse_dtype(value: str) -> pl.DataType:
+    """Parse a Polars data type from its string representation.
+
+    Args:
+        value (str): The data type, e.g. "Int16", "Float32" or 'Datetime("ms")'.
+
+    Returns:
+        pl.DataType: The Polars data type.
+
+    Raises:
+        ValueError: If the value is not a valid Polars data type.
+
+    """
+    match = _DTYPE_PATTERN.fullmatch(value.strip())
+    if match is None:
+        raise ValueError(f"Invalid data type: '{value}'.")
+
+    dtype = getattr(pl, match.group("name"), None)
+    if not (isinstance(dtype, type) and issubclass(dtype, pl.DataType)):
+        raise ValueError(f"Unknown data type: '{value}'.")
+
+    args = match.group("args")
+    try:
+        params = ast.literal_eval(f"({args},)") if args else ()
+        return dtype(*params)
+    except (ValueError, TypeError, SyntaxError) as e:
+        raise ValueError(f"Invalid data type parameters: '{value}'. {e}")
+
+
+def to_series(values: Sequence, dtype: pl.DataType | None) -> pl.Series:
+    """Build a Series of the given data type without inferring it from the values.
+
+    Args:
+        values (Sequence): The values, either a Series or a sequence of Python objects.
+        dtype (pl.DataType | None): The data type of the Series. If None, the data
+            type is inferred from the values.
+
+    Returns:
+        pl.Series: The typed Series.
+
+    """
+    if not isinstance(values, pl.Series):
+        values = pl.Series(values=values, dtype=dtype)
+    if dtype is None or values.dtype == dtype:
+        return values
+    # temporal values are not always converted on construction
+    return values.cast(dtype)
@@ -18,3 +18,13 @@ class MimicryInvalidCountValueError(Exception):
         super().__init__(
             f"Invalid count value: {count}. It must be a positive integer.",
         )
+
+
+class MimicryInvalidWorkersValueError(Exception):
+    """Exception raised when the number of workers is invalid."""
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        super().__init__(
+            f"Invalid workers value: {workers}. It must be a positive integer.",
+        )
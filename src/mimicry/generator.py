@@ -0,0 +1,665 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import secrets
+from collections import deque
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Self
+
+import numpy as np
+import polars as pl
+from mimesis import Fieldset, Locale
+
+from mimicry.cache import BatchCache
+from mimicry.dtypes import to_series
+from mimicry.exceptions import (
+    MimicryInvalidCountValueError,
+    MimicryInvalidFieldConfigurationError,
+    MimicryInvalidWorkersValueError,
+)
+from mimicry.keys import KeyRegistry
+from mimicry.models import FieldConfiguration, TableConfiguration
+from mimicry.vectorized import get_vectorized_generator, sample
+
+ColumnGenerator = Callable[[int], Sequence]
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_locale(locale: str) -> Locale:
+    """Resolve the mimesis locale for the given locale code.
+
+    Args:
+        locale (str): The locale code, e.g. "en" or "de".
+
+    Returns:
+        Locale: The mimesis locale. Defaults to English if the code is unknown.
+
+    """
+    try:
+        return getattr(Locale, locale.upper())
+    except AttributeError:
+        logger.warning("Locale '%s' not found. Defaulting to English.", locale)
+        return Locale.EN
+
+
+def validate_count(count: int) -> int:
+    """Validate the number of records to generate.
+
+    Args:
+        count (int): The number of records to generate.
+
+    Returns:
+        int: The validated count.
+
+    Raises:
+        MimicryInvalidCountValueError: If the count is not a positive integer.
+
+    """
+    try:
+        count = int(count)
+        assert count > 0, "Count must be a positive integer."
+    except (ValueError, AssertionError):
+        raise MimicryInvalidCountValueError(count=count)
+    return count
+
+
+DEFAULT_SHARD_SIZE = 100_000
+
+
+def split_count(count: int, shard_size: int) -> list[int]:
+    """Split the number of records into shards of a fixed size.
+
+    Args:
+        count (int): The number of records to split.
+        shard_size (int): The maximum number of records per shard.
+
+    Returns:
+        list[int]: The number of records per shard. Only the last shard can be smaller.
+
+    """
+    full_shards, remainder = divmod(count, shard_size)
+    return [shard_size] * full_shards + ([remainder] if remainder else [])
+
+
+def scale_outliers(column: pl.Expr, dtype: pl.DataType, scale: float) -> pl.Expr:
+    """Multiply the values of a numeric column into outliers of the same type.
+
+    The outliers are computed as floats and clamped to the range of integer and
+    `Float32` columns, so the values that overflow the type do not become nulls.
+
+    Args:
+        column (pl.Expr): The column.
+        dtype (pl.DataType): The type of the column.
+        scale (float): The factor the values are multiplied by.
+
+    Returns:
+        pl.Expr: The outliers, of the type of the column.
+
+    """
+    scaled = column.cast(pl.Float64) * scale
+    if dtype.is_integer():
+        lower, upper = dtype.min(), dtype.max()
+    elif dtype == pl.Float32:
+        info = np.finfo(np.float32)
+        lower, upper = pl.lit(info.min, dtype), pl.lit(info.max, dtype)
+    else:
+        return scaled.cast(dtype, strict=False)
+    return (
+        pl.when(scaled >= upper)
+        .then(upper)
+        .when(scaled <= lower)
+        .then(lower)
+        .otherwise(scaled.cast(dtype, strict=False))
+    )
+
+
+def derive_seed(seed: int, *keys: int) -> int:
+    """Derive an independent seed from a base seed and a sequence of keys.
+
+    Args:
+        seed (int): The base seed.
+        *keys (int): The keys, e.g. the batch and shard indexes.
+
+    Returns:
+        int: The derived seed.
+
+    """
+    return int(np.random.SeedSequence([seed, *keys]).generate_state(1, np.uint64)[0])
+
+
+def create_worker_pool(workers: int) -> ProcessPoolExecutor:
+    """Create a process pool to generate shards in.
+
+    The pool can be shared by the generators of different tables.
+
+    Args:
+        workers (int): The number of processes.
+
+    Returns:
+        ProcessPoolExecutor: The process pool.
+
+    Raises:
+        MimicryInvalidWorkersValueError: If workers is not a positive integer.
+
+    """
+    if workers < 1:
+        raise MimicryInvalidWorkersValueError(workers=workers)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+# generators compiled in a worker process, keyed by the table they were built for
+_worker_generators: dict[str, "TableGenerator"] = {}
+
+
+def _generate_shard(
+    key: str,
+    table: TableConfiguration,
+    pools: dict[str, list[str]],
+    count: int,
+    seed: int,
+) -> pl.DataFrame:
+    if key not in _worker_generators:
+        _worker_generators[key] = TableGenerator(table=table, strict=True, pools=pools)
+    return _worker_generators[key]._generate_shard(count, seed)
+
+
+class TableGenerator:
+    """Compiled data generator for a table configuration.
+
+    The locale, mimesis providers and field checks are resolved once when the
+    generator is built, so that each batch only pays for generating the values
+    themselves. Fields with a vectorized generator (see `mimicry.vectorized`)
+    are generated as whole columns, the remaining ones with mimesis.
+
+    Each batch is split into shards of `shard_size` records, and every shard is
+    generated with a seed derived from `(seed, batch_idx, shard_idx)`. Hence a
+    seeded table produces the same data regardless of the number of workers, but
+    not of the shard size. Only the shards are generated in parallel, so a batch
+    of at most `shard_size` records is generated by a single worker.
+
+    Fields referencing another table draw their values from the keys published to
+    a `KeyRegistry`, and the referenced columns of the table are published to it.
+    Both happen in the calling process, after the shards are generated, followed
+    by the fields defined by an expression over the other columns. Nulls, outliers
+    and duplicates are injected last, after the keys are published.
+    """
+
+    def __init__(
+        self,
+        table: TableConfiguration,
+        strict: bool,
+        workers: int = 1,
+        pools: dict[str, list[str]] | None = None,
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        executor: ProcessPoolExecutor | None = None,
+        registry: KeyRegistry | None = None,
+        cache: BatchCache | None = None,
+    ) -> None:
+        """Compile the generator for a table configuration.
+
+        Args:
+            table (TableConfiguration): The table configuration.
+            strict (bool): If True, raises an error if any field configuration is invalid.
+                If False, invalid fields are logged and skipped.
+            workers (int): The number of processes used to generate a batch. If greater
+                than 1, the shards of each batch are generated in a process pool.
+            pools (dict[str, list[str]] | None): Pre-built value pools of categorical
+                fields, keyed by field name. Missing pools are built from mimesis.
+            shard_size (int): The maximum number of records per shard.
+            executor (ProcessPoolExecutor | None): A process pool shared with other
+                generators, see `create_worker_pool`. If None and workers is greater
+                than 1, the generator starts (and shuts down) its own pool.
+            registry (KeyRegistry | None): The registry of the keys shared with the
+                generators of other tables. If None, fields referencing other tables
+                are invalid.
+            cache (BatchCache | None): The cache of generated batches. Batches found
+                in the cache are read instead of generated, the others are written to
+                it. Ignored if the table has no seed or references other tables.
+
+        Raises:
+            MimicryInvalidFieldConfigurationError: If strict is True and a field is invalid.
+            MimicryInvalidWorkersValueError: If workers is not a positive integer.
+            MimicryInvalidCountValueError: If shard_size is not a positive integer.
+
+        """
+        if workers < 1:
+            raise MimicryInvalidWorkersValueError(workers=workers)
+        shard_size = validate_count(shard_size)
+
+        self.table = table
+        self.strict = strict
+        self.workers = workers
+        self.shard_size = shard_size
+        self.registry = registry
+        self.cache = cache
+        if cache is not None and table.seed is None:
+            logger.warning(
+                "Table '%s' has no seed, hence its batches are not cached.", table.name
+            )
+            self.cache = None
+        if self.cache is not None and any(field.references for field in table.fields):
+            # the keys drawn from the registry are not part of the cache key
+            logger.warning(
+                "Table '%s' references other tables, hence its batches are not cached.",
+                table.name,
+            )
+            self.cache = None
+        self.seed = table.seed if table.seed is not None else secrets.randbits(64)
+        logger.debug("Using seed %d for table '%s'.", self.seed, table.name)
+        self.fieldset = Fieldset(locale=resolve_locale(table.locale))
+        self.rng = np.random.default_rng()
+        # pools of categorical fields are built from the seeded generators
+        self.reseed(derive_seed(self.seed))
+        self.pools = dict(pools or {})
+        self.columns: dict[str, ColumnGenerator] = {}
+        self.references: dict[str, ColumnGenerator] = {}
+        self.expressions: dict[str, pl.Expr] = {}
+        self._reference_rng = np.random.default_rng()
+        self.schema = pl.Schema()
+        self.fields = self._compile_fields()
+        self._is_dirty = self.table.duplicate_rate > 0 or any(
+            field.null_rate > 0 or field.outlier_rate > 0 for field in self.fields
+        )
+        self._executor = executor
+        self._owns_executor = executor is None
+        # only the fields that passed the checks are sent to the workers
+        self._worker_args = self._build_worker_args()
+        self._batch_idx = 0
+
+    def reseed(self, seed: int) -> None:
+        """Reseed the random generators used by the generator.
+
+        Args:
+            seed (int): The seed.
+
+        """
+        self.fieldset.reseed(seed)
+        self.rng = np.random.default_rng(seed)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the process pool, if it was started by the generator."""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = create_worker_pool(self.workers)
+        return self._executor
+
+    def _build_worker_args(self) -> tuple[str, TableConfiguration, dict]:
+        # referenced keys and expressions are resolved in this process
+        fields = [field for field in self.fields if field.name in self.columns]
+        table = self.table.model_copy(update={"fields": fields})
+        key = hashlib.sha256(
+            json.dumps(
+                [table.model_dump(mode="json"), self.pools], sort_keys=True
+            ).encode("utf-8")
+        ).hexdigest()
+        return key, table, self.pools
+
+    def _compile_fields(self) -> list[FieldConfiguration]:
+        schema = {}
+        for field in self.table.fields:
+            if field.expression is None:
+                self._try_compile(field, self._compile_column, schema)
+        # expressions are checked against the columns that are generated
+        generated = pl.Schema(schema)
+        for field in self.table.fields:
+            if field.expression is not None:
+                compile_expression = partial(self._compile_expression, schema=generated)
+                self._try_compile(field, compile_expression, schema)
+
+        fields = [field for field in self.table.fields if field.name in schema]
+        self.schema = pl.Schema({field.name: schema[field.name] for field in fields})
+        return fields
+
+    def _try_compile(
+        self,
+        field: FieldConfiguration,
+        compile_field: Callable[[FieldConfiguration], pl.DataType],
+        schema: dict[str, pl.DataType],
+    ) -> None:
+        try:
+            dtype = compile_field(field)
+            if field.outlier_rate > 0 and not (dtype.is_numeric() or dtype == pl.Null):
+                raise ValueError(
+                    f"Outliers are supported for numeric fields only, got {dtype}."
+                )
+            schema[field.name] = dtype
+        except Exception as e:
+            if self.strict:
+                raise MimicryInvalidFieldConfigurationError(field=field, exception=e)
+            logger.warning(
+                "Failed to generate data for field '%s': %s. Skipping this field.",
+                field.name,
+                e,
+            )
+
+    def _compile_column(self, field: FieldConfiguration) -> pl.DataType:
+        if field.references is not None:
+            self.references[field.name] = self._compile_reference_field(field)
+            return self._reference_dtype(field)
+
+        column = self._compile_field(field)
+        dtype = to_series(column(1), field.polars_dtype).dtype
+        self.columns[field.name] = column
+        return dtype
+
+    def _compile_expression(
+        self,
+        field: FieldConfiguration,
+        schema: pl.Schema,
+    ) -> pl.DataType:
+        expression = pl.sql_expr(field.expression)
+        if field.polars_dtype is not None:
+            expression = expression.cast(field.polars_dtype)
+        expression = expression.alias(field.name)
+        # resolves the columns and the type without evaluating the expression
+        dtype = (
+            pl.LazyFrame(schema=schema).select(expression).collect_schema()[field.name]
+        )
+        self.expressions[field.name] = expression
+        return dtype
+
+    def _compile_field(self, field: FieldConfiguration) -> ColumnGenerator:
+        if field.categorical:
+            return self._compile_categorical_field(field)
+
+        column = self._compile_values(field)
+        dtype = field.polars_dtype
+        if dtype is None:
+            return column
+        return lambda count: to_series(column(count), dtype)
+
+    def _compile_values(self, field: FieldConfiguration) -> ColumnGenerator:
+        vectorized = get_vectorized_generator(
+            field.mimesis_field_name, field.mimesis_field_kwargs
+        )
+        if vectorized is not None and not field.mimesis_field_args:
+
+            def column(count: int) -> pl.Series:
+                return vectorized(self.rng, count, **field.mimesis_field_kwargs)
+
+            try:
+                column(1)
+                return column
+            except Exception as e:
+                logger.debug(
+                    "Vectorized generator for field '%s' is not applicable: %s. Falling back to mimesis.",
+                    field.name,
+                    e,
+                )
+
+        return partial(self._generate_with_mimesis, field)
+
+    def _generate_with_mimesis(self, field: FieldConfiguration, count: int) -> list:
+        return self.fieldset(
+            field.mimesis_field_name,
+            *field.mimesis_field_args,
+            i=count,
+            **field.mimesis_field_kwargs,
+        )
+
+    def _compile_categorical_field(self, field: FieldConfiguration) -> ColumnGenerator:
+        if field.name not in self.pools:
+            self.pools[field.name] = self._build_pool(field)
+        pool = self.pools[field.name]
+        values = pl.Series(pool, dtype=pl.Enum(pool))
+
+        def column(count: int) -> pl.Series:
+            return sample(self.rng, count, values)
+
+        return column
+
+    def _build_pool(self, field: FieldConfiguration) -> list[str]:
+        if (
+            field.mimesis_field_name in ("choice.choice", "choice")
+            and not field.mimesis_field_args
+            and list(field.mimesis_field_kwargs) == ["items"]
+        ):
+            # the pool of a plain choice is known upfront
+            values = field.mimesis_field_kwargs["items"]
+        else:
+            values = self._generate_with_mimesis(field, field.categorical_pool_size)
+
+        pool = list(dict.fromkeys(values))
+        if not all(isinstance(value, str) for value in pool):
+            raise ValueError("Categorical fields support only string values.")
+        return pool
+
+    def _compile_reference_field(self, field: FieldConfiguration) -> ColumnGenerator:
+        if self.registry is None:
+            raise ValueError(
+                f"Field references '{field.references}', but no key registry is available"
+            )
+        registry = self.registry
+        registry.expect(field.references)
+        dtype = field.polars_dtype
+
+        def column(count: int) -> pl.Series:
+            keys = registry.sample(
+                field.references, self._reference_rng, count, field.reference_skew
+            )
+            return to_series(keys, dtype)
+
+        return column
+
+    def _reference_dtype(self, field: FieldConfiguration) -> pl.DataType:
+        if field.polars_dtype is not None:
+            return field.polars_dtype
+        # without waiting for the keys, the type is known only once they are published
+        index = self.registry.expect(field.references)
+        return index.keys.dtype if len(index) else pl.Null()
+
+    def _complete_shard(
+        self, shard: pl.DataFrame, count: int, seed: int
+    ) -> pl.DataFrame:
+        if not self.references and not self.expressions:
+            return shard
+
+        if self.references:
+            self._reference_rng = np.random.default_rng(derive_seed(seed))
+            references = pl.DataFrame(
+                [column(count).alias(name) for name, column in self.references.items()]
+            )
+            shard = shard.hstack(references) if shard.width else references
+        # all derived columns are evaluated in a single pass
+        shard = shard.with_columns(*self.expressions.values())
+        shard = shard.select(self.schema.names())
+        if self.references:
+            # the types of the referenced keys are known once they are published
+            self.schema = shard.schema
+        return shard
+
+    def _inject_dirty_data(self, shard: pl.DataFrame, seed: int) -> pl.DataFrame:
+        # a stream of its own, independent of the one of the referenced keys
+        rng = np.random.default_rng(derive_seed(seed, 1))
+        count = shard.height
+
+        columns = []
+        for field in self.fields:
+            if field.null_rate == 0 and field.outlier_rate == 0:
+                continue
+            column = pl.col(field.name)
+            if field.outlier_rate > 0:
+                outliers = pl.lit(pl.Series(rng.random(count) < field.outlier_rate))
+                column = (
+                    pl.when(outliers)
+                    .then(
+                        scale_outliers(
+                            column, self.schema[field.name], field.outlier_scale
+                        )
+                    )
+                    .otherwise(column)
+                    .cast(self.schema[field.name], strict=False)
+                )
+            if field.null_rate > 0:
+                nulls = pl.lit(pl.Series(rng.random(count) < field.null_rate))
+                column = pl.when(nulls).then(None).otherwise(column)
+            columns.append(column.alias(field.name))
+        # all columns are masked in a single pass
+        shard = shard.with_columns(columns)
+
+        if self.table.duplicate_rate > 0:
+            duplicates = rng.random(count) < self.table.duplicate_rate
+            originals = np.flatnonzero(~duplicates)
+            if len(originals) > 0:
+                rows = np.arange(count)
+                rows[duplicates] = rng.choice(originals, size=duplicates.sum())
+                shard = shard[rows]
+        return shard
+
+    def _generate_frame(self, count: int) -> pl.DataFrame:
+        return pl.DataFrame(
+            {name: column(count) for name, column in self.columns.items()}
+        )
+
+    def _generate_shard(self, count: int, seed: int) -> pl.DataFrame:
+        self.reseed(seed)
+        return self._generate_frame(count)
+
+    def _next_batch_idx(self, batch_idx: int | None) -> int:
+        if batch_idx is None:
+            batch_idx = self._batch_idx
+        self._batch_idx = batch_idx + 1
+        return batch_idx
+
+    def _iter_shards(self, count: int, batch_idx: int) -> Iterator[pl.DataFrame]:
+        seeds = [
+            derive_seed(self.seed, batch_idx, shard_idx)
+            for shard_idx in range(len(split_count(count, self.shard_size)))
+        ]
+        # the keys are published before the dirty data is injected, whether the
+        # shards are generated or read from the cache
+        for data, seed in zip(self._iter_clean_shards(count, batch_idx, seeds), seeds):
+            if self.registry is not None:
+                self.registry.publish(self.table.name, data)
+            if self._is_dirty:
+                data = self._inject_dirty_data(data, seed)
+            yield data
+
+    def _iter_clean_shards(
+        self, count: int, batch_idx: int, seeds: list[int]
+    ) -> Iterator[pl.DataFrame]:
+        if self.cache is None:
+            yield from self._generate_shards(count, seeds)
+            return
+
+        key = self.cache.key(self.table, count, batch_idx, self.shard_size)
+        cached = self.cache.get(key)
+        if cached is not None:
+            for offset in range(0, count, self.shard_size):
+                yield cached.slice(offset, self.shard_size)
+            return
+
+        with self.cache.writer(key) as write:
+            for data in self._generate_shards(count, seeds):
+                write(data)
+                yield data
+
+    def _generate_shards(self, count: int, seeds: list[int]) -> Iterator[pl.DataFrame]:
+        shards = split_count(count, self.shard_size)
+        generated = self._iter_generated_shards(shards, seeds)
+        for data, shard, seed in zip(generated, shards, seeds):
+            yield self._complete_shard(data, shard, seed)
+
+    def _iter_generated_shards(
+        self,
+        shards: list[int],
+        seeds: list[int],
+    ) -> Iterator[pl.DataFrame]:
+        if self.workers == 1 or len(shards) == 1:
+            yield from map(self._generate_shard, shards, seeds)
+            return
+
+        # at most `workers` shards are in flight, so memory does not grow with count
+        executor = self._get_executor()
+        pending = deque()
+        for shard, seed in zip(shards, seeds):
+            pending.append(
+                executor.submit(_generate_shard, *self._worker_args, shard, seed)
+            )
+            if len(pending) >= self.workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def iter_shards(
+        self,
+        count: int,
+        batch_idx: int | None = None,
+    ) -> Iterator[pl.DataFrame]:
+        """Generate a batch of data shard by shard.
+
+        Only the shards that are currently generated are held in memory, so the peak
+        memory usage depends on `shard_size` (and `workers`), not on `count`.
+
+        Args:
+            count (int): The number of records to generate.
+            batch_idx (int | None): The index of the batch, used to derive its seeds.
+                If None, the batches are numbered in the order they are generated.
+
+        Yields:
+            pl.DataFrame: The shards of the generated data, in order.
+
+        Raises:
+            MimicryInvalidCountValueError: If the count is not a positive integer.
+
+        """
+        count = validate_count(count)
+        yield from self._iter_shards(count, self._next_batch_idx(batch_idx))
+
+    def generate(
+        self,
+        count: int,
+        batch_idx: int | None = None,
+        log: bool = True,
+    ) -> pl.DataFrame:
+        """Generate a batch of data.
+
+        Args:
+            count (int): The number of records to generate.
+            batch_idx (int | None): The index of the batch, used to derive its seeds.
+                If None, the batches are numbered in the order they are generated.
+            log (bool): If True, logs the schema and the head of the generated data.
+
+        Returns:
+            pl.DataFrame: A DataFrame representing the generated data.
+
+        Raises:
+            MimicryInvalidCountValueError: If the count is not a positive integer.
+
+        """
+        count = validate_count(count)
+        shards = self._iter_shards(count, self._next_batch_idx(batch_idx))
+        results = pl.concat(shards, rechunk=False)
+        if log:
+            logger.info(
+                "Generated %d records for table '%s' with schema:\n%s",
+                count,
+                self.table.name,
+                json.dumps(results.schema, indent=4, default=str),
+            )
+            logger.debug(
+                "Head of the generated data for table '%s':\n%s",
+                self.table.name,
+                results.head(5),  # Show only the first 5 records for debugging
+            )
+        return results
+
+
+__all__ = ["TableGenerator"]
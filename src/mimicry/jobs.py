@@ -0,0 +1,192 @@
+import logging
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+
+from mimicry.core import load_sink_config, load_table_config
+from mimicry.data import stream_data
+from mimicry.generator import create_worker_pool
+from mimicry.keys import DEFAULT_MAX_KEYS, KeyRegistry, parse_reference
+from mimicry.models import (
+    JobConfiguration,
+    SinkConfiguration,
+    StreamConfiguration,
+    TableConfiguration,
+)
+
+logger = logging.getLogger(__name__)
+
+# seconds between the checks of the main thread for Ctrl-C while the streams run
+STOP_CHECK_INTERVAL = 0.5
+
+
+def run_stream(
+    stream: StreamConfiguration,
+    table: TableConfiguration,
+    sink: SinkConfiguration,
+    workers: int,
+    executor: ProcessPoolExecutor | None,
+    registry: KeyRegistry,
+    strict: bool,
+    stop: threading.Event | None = None,
+) -> None:
+    if stream.seed is not None:
+        table = table.model_copy(update={"seed": stream.seed})
+
+    stream_data(
+        table=table,
+        count=stream.count,
+        interval=stream.interval or 0.0,
+        num_of_batches=stream.batches,
+        sink=sink,
+        strict=strict,
+        workers=workers,
+        chunk_rows=stream.chunk_rows,
+        queue_depth=stream.queue_depth,
+        rows_per_second=stream.rows_per_second,
+        executor=executor,
+        registry=registry,
+        stop=stop,
+    )
+
+
+def build_key_registry(
+    tables: list[TableConfiguration],
+    max_keys: int | None = DEFAULT_MAX_KEYS,
+) -> KeyRegistry:
+    """Build the registry of the keys referenced across the tables of a job.
+
+    The referenced columns are registered before any stream starts, so that their
+    keys are published from the first batch on.
+
+    Args:
+        tables (list[TableConfiguration]): The table configurations.
+        max_keys (int | None): The maximum number of keys kept per referenced column.
+
+    Returns:
+        KeyRegistry: The key registry.
+
+    Raises:
+        ValueError: If a field references a table that is not in the job.
+
+    """
+    registry = KeyRegistry(max_keys=max_keys)
+    names = {table.name for table in tables}
+    for table in tables:
+        for field in table.fields:
+            if field.references is None:
+                continue
+            referenced_table, _ = parse_reference(field.references)
+            if referenced_table not in names:
+                raise ValueError(
+                    f"Field '{field.name}' of table '{table.name}' references "
+                    f"'{field.references}', but table '{referenced_table}' is not part of the job."
+                )
+            registry.expect(field.references)
+    return registry
+
+
+def run_job(job: JobConfiguration, strict: bool = False) -> None:
+    """Run the streams of a job concurrently in a single process.
+
+    Every stream runs in its own thread with its own scheduler, while the
+    generation of the batches is shared by a single process pool. Fields that
+    reference a table of another stream draw from the keys that stream generated.
+    When the job is interrupted, the streams stop after their current batch and
+    their sinks are flushed and closed as if the streams had completed.
+
+    Args:
+        job (JobConfiguration): The job configuration.
+        strict (bool): If True, raises an error if any table configuration is invalid.
+
+    Raises:
+        ValueError: If a field references a table that is not streamed by the job.
+        Exception: The first error raised by a stream, after all streams finished.
+        KeyboardInterrupt: If the job was interrupted, once all streams stopped.
+
+    """
+    # configurations are loaded upfront, so that invalid ones fail before streaming
+    configs = [
+        (stream, load_table_config(stream.table), load_sink_config(stream.sink))
+        for stream in job.streams
+    ]
+    registry = build_key_registry(
+        [table for _, table, _ in configs], max_keys=job.max_keys
+    )
+
+    executor = create_worker_pool(job.workers) if job.workers > 1 else None
+    stop = threading.Event()
+    interrupted = False
+    errors = []
+    futures: dict[Future, TableConfiguration] = {}
+    remaining: set[Future] = set()
+
+    def report(future: Future) -> None:
+        remaining.discard(future)
+        table = futures[future]
+        if future.exception() is not None:
+            logger.error(
+                "Streaming for table '%s' failed: %s",
+                table.name,
+                future.exception(),
+            )
+            errors.append(future.exception())
+        else:
+            logger.info("Streaming for table '%s' completed.", table.name)
+
+    try:
+        with ThreadPoolExecutor(
+            max_workers=len(configs),
+            thread_name_prefix="mimicry-stream",
+        ) as threads:
+            futures = {
+                threads.submit(
+                    run_stream,
+                    stream=stream,
+                    table=table,
+                    sink=sink,
+                    workers=job.workers,
+                    executor=executor,
+                    registry=registry,
+                    strict=strict,
+                    stop=stop,
+                ): table
+                for stream, table, sink in configs
+            }
+            remaining = set(futures)
+            try:
+                while remaining:
+                    # the main thread wakes up regularly to handle Ctrl-C, as the
+                    # signal may be delivered while another thread is running
+                    done, _ = wait(
+                        remaining,
+                        timeout=STOP_CHECK_INTERVAL,
+                        return_when=FIRST_COMPLETED,
+                    )
+                    for future in done:
+                        report(future)
+            except KeyboardInterrupt:
+                # only the main thread is interrupted, so the streams are stopped
+                # after their current batch, and their sinks are closed normally
+                logger.warning("Stopping the streams after their current batch.")
+                interrupted = True
+                stop.set()
+                for future in as_completed(set(remaining)):
+                    report(future)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if errors:
+        raise errors[0]
+    if interrupted:
+        raise KeyboardInterrupt
+
+
+__all__ = ["run_job"]
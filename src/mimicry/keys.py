@@ -0,0 +1,288 @@
+import threading
+
+import numpy as np
+import polars as pl
+
+# seconds to wait for the referenced table to publish its first keys
+DEFAULT_KEY_TIMEOUT = 60.0
+
+# keys kept per referenced column, beyond which a uniform sample of them is kept
+DEFAULT_MAX_KEYS = 1_000_000
+
+
+def parse_reference(reference: str) -> tuple[str, str]:
+    """Split a reference into the referenced table and column.
+
+    Args:
+        reference (str): The reference, e.g. "DimUsers.user_id".
+
+    Returns:
+        tuple[str, str]: The name of the table and the name of the column.
+
+    Raises:
+        ValueError: If the reference is not in the "Table.column" format.
+
+    """
+    table, _, column = reference.strip().rpartition(".")
+    if not table or not column:
+        raise ValueError(
+            f"Invalid reference: '{reference}'. Expected the 'Table.column' format."
+        )
+    return table, column
+
+
+class KeyIndex:
+    """Index of the keys generated for a column.
+
+    The keys are kept in a few contiguous segments of doubling sizes, so that each
+    published key is copied a logarithmic number of times, and drawing foreign keys
+    is a random gather rather than a lookup in a Python collection. Once the index
+    holds `max_keys` keys, it keeps a uniform sample of all the published keys
+    (reservoir sampling), so a dimension streamed until stopped takes bounded memory.
+    """
+
+    def __init__(self, max_keys: int | None = DEFAULT_MAX_KEYS) -> None:
+        """Initialize the index.
+
+        Args:
+            max_keys (int | None): The maximum number of keys kept. If None, all
+                published keys are kept.
+
+        """
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._published = threading.Event()
+        self._segments: list[pl.Series] = []
+        self._length = 0
+        # the number of keys published, including the ones not kept
+        self._seen = 0
+        self._rng = np.random.default_rng()
+        # cumulative Zipf weights, cached by skew and extended by doubling
+        self._cumulative_weights: tuple[float, np.ndarray] | None = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._length
+
+    @property
+    def keys(self) -> pl.Series:
+        """The keys kept so far, in the order they were published."""
+        with self._lock:
+            return self._view()
+
+    def _view(self) -> pl.Series:
+        if not self._segments:
+            return pl.Series(dtype=pl.Null)
+        return pl.concat(self._segments, rechunk=False)
+
+    def publish(self, keys: pl.Series) -> None:
+        """Add the keys of a generated batch to the index.
+
+        Args:
+            keys (pl.Series): The generated keys.
+
+        """
+        keys = keys.alias("key")
+        with self._lock:
+            free = len(keys)
+            if self.max_keys is not None:
+                free = max(min(free, self.max_keys - self._length), 0)
+            if free > 0:
+                self._append(keys.slice(0, free))
+            if free < len(keys):
+                self._replace(keys.slice(free), seen=self._seen + free)
+            self._seen += len(keys)
+        self._published.set()
+
+    def _append(self, keys: pl.Series) -> None:
+        segment = keys.rechunk()
+        # merging the segments of at most the same size keeps their sizes doubling
+        while self._segments and len(self._segments[-1]) <= len(segment):
+            segment = pl.concat([self._segments.pop(), segment], rechunk=True)
+        self._segments.append(segment)
+        self._length += len(keys)
+
+    def _replace(self, keys: pl.Series, seen: int) -> None:
+        # the key published after `n` others replaces a kept key with a
+        # probability of `max_keys / (n + 1)`
+        slots = self._rng.integers(0, np.arange(seen, seen + len(keys)) + 1)
+        replaced = slots < self.max_keys
+        if not replaced.any():
+            return
+        slots = slots[replaced]
+        keys = keys.filter(pl.Series(replaced))
+        # a slot replaced several times keeps the last key
+        _, last = np.unique(slots[::-1], return_index=True)
+        positions = len(slots) - 1 - last
+
+        index = self._view().rechunk().clone()
+        index.scatter(slots[positions], keys.gather(positions))
+        self._segments = [index]
+
+    def wait(self, timeout: float | None = DEFAULT_KEY_TIMEOUT) -> bool:
+        """Wait until the first keys are published.
+
+        Args:
+            timeout (float | None): The number of seconds to wait. If None, waits
+                until the keys are published.
+
+        Returns:
+            bool: True if keys were published, False if the timeout expired.
+
+        """
+        return self._published.wait(timeout)
+
+    def sample(
+        self, rng: np.random.Generator, count: int, skew: float = 0.0
+    ) -> pl.Series:
+        """Draw keys at random (with replacement).
+
+        Args:
+            rng (np.random.Generator): The random generator.
+            count (int): The number of keys to draw.
+            skew (float): The exponent of the Zipf-like distribution of the keys. The
+                probability of the key at position `k` is proportional to `1 / k**skew`,
+                so the first published keys are the most frequent ones. If 0, the keys
+                are drawn uniformly.
+
+        Returns:
+            pl.Series: The drawn keys.
+
+        Raises:
+            ValueError: If no keys were published.
+
+        """
+        keys = self.keys
+        if len(keys) == 0:
+            raise ValueError("No keys were published.")
+        if skew == 0:
+            positions = rng.integers(0, len(keys), size=count)
+        else:
+            cumulative_weights = self._zipf_cumulative_weights(len(keys), skew)
+            positions = np.searchsorted(
+                cumulative_weights,
+                rng.random(size=count) * cumulative_weights[-1],
+                side="right",
+            )
+            # guards against drawing past the last key due to rounding
+            positions = np.minimum(positions, len(keys) - 1)
+        return keys.gather(positions)
+
+    def _zipf_cumulative_weights(self, length: int, skew: float) -> np.ndarray:
+        cached = self._cumulative_weights
+        if cached is None or cached[0] != skew or len(cached[1]) < length:
+            # the weights are computed for twice the keys, so they are not
+            # recomputed every time keys are published
+            capacity = 2 * length
+            if self.max_keys is not None:
+                capacity = max(min(capacity, self.max_keys), length)
+            weights = np.arange(1, capacity + 1, dtype=np.float64) ** -skew
+            cached = (skew, np.cumsum(weights))
+            self._cumulative_weights = cached
+        return cached[1][:length]
+
+
+class KeyRegistry:
+    """Registry of the keys generated for the columns referenced by other tables.
+
+    A column is published only once it is expected, i.e. once a table with a field
+    referencing it has been registered, so that tables pay for the index only when
+    their keys are actually used.
+    """
+
+    def __init__(
+        self,
+        timeout: float | None = DEFAULT_KEY_TIMEOUT,
+        max_keys: int | None = DEFAULT_MAX_KEYS,
+    ) -> None:
+        """Initialize the registry.
+
+        Args:
+            timeout (float | None): The number of seconds a referencing table waits
+                for the referenced table to publish its first keys.
+            max_keys (int | None): The maximum number of keys kept per referenced
+                column. If None, all published keys are kept.
+
+        """
+        self.timeout = timeout
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._indexes: dict[tuple[str, str], KeyIndex] = {}
+
+    def expect(self, reference: str) -> KeyIndex:
+        """Get the index of a referenced column, creating it if needed.
+
+        Args:
+            reference (str): The reference, e.g. "DimUsers.user_id".
+
+        Returns:
+            KeyIndex: The index of the referenced column.
+
+        Raises:
+            ValueError: If the reference is not in the "Table.column" format.
+
+        """
+        key = parse_reference(reference)
+        with self._lock:
+            if key not in self._indexes:
+                self._indexes[key] = KeyIndex(max_keys=self.max_keys)
+            return self._indexes[key]
+
+    def expected_columns(self, table: str) -> list[str]:
+        """The columns of a table that are referenced by other tables.
+
+        Args:
+            table (str): The name of the table.
+
+        Returns:
+            list[str]: The names of the referenced columns.
+
+        """
+        with self._lock:
+            return [column for name, column in self._indexes if name == table]
+
+    def publish(self, table: str, data: pl.DataFrame) -> None:
+        """Publish the keys of the referenced columns of a generated batch.
+
+        Args:
+            table (str): The name of the table the data was generated for.
+            data (pl.DataFrame): The generated data.
+
+        """
+        for column in self.expected_columns(table):
+            if column in data.columns:
+                self.expect(f"{table}.{column}").publish(data[column])
+
+    def sample(
+        self,
+        reference: str,
+        rng: np.random.Generator,
+        count: int,
+        skew: float = 0.0,
+    ) -> pl.Series:
+        """Draw keys of a referenced column at random.
+
+        Waits until the referenced table publishes its first keys.
+
+        Args:
+            reference (str): The reference, e.g. "DimUsers.user_id".
+            rng (np.random.Generator): The random generator.
+            count (int): The number of keys to draw.
+            skew (float): The exponent of the Zipf-like distribution of the keys.
+
+        Returns:
+            pl.Series: The drawn keys.
+
+        Raises:
+            ValueError: If the referenced table does not publish any keys in time.
+
+        """
+        index = self.expect(reference)
+        if not index.wait(self.timeout):
+            raise ValueError(
+                f"No keys were published for '{reference}' within {self.timeout} seconds."
+            )
+        return index.sample(rng, count, skew)
+
+
+__all__ = ["KeyIndex", "KeyRegistry", "parse_reference"]
@@ -1,16 +1,66 @@
 from typing import Literal
 
-from pydantic import BaseModel, Field, field_validator
+import polars as pl
+from deltalake import WriterProperties
+from pydantic import BaseModel, Field, field_validator, model_validator
+from pyiceberg.transforms import UnknownTransform, VoidTransform, parse_transform
+
+from mimicry.dtypes import parse_dtype
+from mimicry.keys import DEFAULT_MAX_KEYS, parse_reference
 
 
 class FieldConfiguration(BaseModel):
     name: str
     description: str
-    mimesis_field_name: str
+    mimesis_field_name: str | None = None
     mimesis_field_args: list[str | int | float | bool] = Field(default_factory=list)
     mimesis_field_kwargs: dict[str, str | int | float | bool | list[str]] = Field(
         default_factory=dict,
     )
+    categorical: bool = Field(
+        default=False,
+        description="If True, values are sampled from a pool built once per generator and stored as an Enum column.",
+    )
+    categorical_pool_size: int = Field(
+        default=1000,
+        gt=0,
+        description="Number of values drawn from mimesis to build the pool of a categorical field.",
+    )
+    dtype: str | None = Field(
+        default=None,
+        description='Polars data type of the column, e.g. "Int16", "Float32" or \'Datetime("ms")\'. Inferred from the values if not set.',
+    )
+    references: str | None = Field(
+        default=None,
+        description='Column of another table whose generated keys are drawn as values, e.g. "DimUsers.user_id".',
+    )
+    expression: str | None = Field(
+        default=None,
+        description='SQL expression over the other columns of the table, e.g. "quantity * unit_price".',
+    )
+    reference_skew: float = Field(
+        default=0.0,
+        ge=0,
+        description="Exponent of the Zipf-like distribution of the referenced keys. If 0, keys are drawn uniformly.",
+    )
+
+    null_rate: float = Field(
+        default=0.0,
+        ge=0,
+        le=1,
+        description="Fraction of the values replaced with nulls.",
+    )
+    outlier_rate: float = Field(
+        default=0.0,
+        ge=0,
+        le=1,
+        description="Fraction of the values of a numeric field replaced with outliers.",
+    )
+    outlier_scale: float = Field(
+        default=100.0,
+        gt=0,
+        description="Factor the values are multiplied by to become outliers. Must be positive and other than 1.",
+    )
 
     @field_validator("name")
     def validate_name(cls, value: str) -> str:
@@ -21,11 +71,71 @@ class FieldConfiguration(BaseModel):
             )
         return proper_value
 
+    @field_validator("outlier_scale")
+    def validate_outlier_scale(cls, value: float) -> float:
+        if value == 1:
+            raise ValueError("Outlier scale of 1 leaves the values unchanged.")
+        return value
+
+    @field_validator("dtype")
+    def validate_dtype(cls, value: str | None) -> str | None:
+        if value is not None:
+            parse_dtype(value)
+        return value
+
+    @field_validator("references")
+    def validate_references(cls, value: str | None) -> str | None:
+        if value is not None:
+            parse_reference(value)
+        return value
+
+    @field_validator("expression")
+    def validate_expression(cls, value: str | None) -> str | None:
+        if value is not None:
+            try:
+                pl.sql_expr(value)
+            except pl.exceptions.PolarsError as e:
+                raise ValueError(f"Invalid expression: '{value}'. {e}")
+        return value
+
+    @model_validator(mode="after")
+    def validate_categorical_dtype(self) -> "FieldConfiguration":
+        if self.categorical and self.dtype is not None:
+            raise ValueError("Categorical fields cannot declare a dtype.")
+        return self
+
+    @model_validator(mode="after")
+    def validate_source(self) -> "FieldConfiguration":
+        sources = [self.mimesis_field_name, self.references, self.expression]
+        if sum(source is not None for source in sources) != 1:
+            raise ValueError(
+                "Exactly one of 'mimesis_field_name', 'references' and 'expression' must be provided."
+            )
+        if self.mimesis_field_name is None and self.categorical:
+            raise ValueError("Only fields generated with mimesis can be categorical.")
+        return self
+
+    @property
+    def polars_dtype(self) -> pl.DataType | None:
+        """The declared Polars data type of the column, if any."""
+        return parse_dtype(self.dtype) if self.dtype is not None else None
+
 
 class TableConfiguration(BaseModel):
     name: str
     description: str
     locale: str = "en"
+    seed: int | None = Field(
+        default=None,
+        ge=0,
+        description="Seed for reproducible data generation. Random if not set.",
+    )
+    duplicate_rate: float = Field(
+        default=0.0,
+        ge=0,
+        lt=1,
+        description="Fraction of the records replaced with copies of other records.",
+    )
     fields: list[FieldConfiguration] = Field(default_factory=list)
 
 
@@ -37,20 +147,73 @@ class DeltaLakeSinkConfiguration(BaseModel):
     type_of_sink: Literal["delta_lake"] = "delta_lake"
     path: str
     partition_by: list[str] | None = None
-    optimize: int | None = None
-    vacuum: int | None = None
+    target_file_size: int | None = Field(
+        default=None,
+        gt=0,
+        description="Target size in bytes of the Parquet files written and compacted. Files smaller than it are considered small. Defaults to 100 MiB.",
+    )
+    max_row_group_size: int | None = Field(
+        default=None,
+        gt=0,
+        description="Maximum number of rows per row group of the Parquet files.",
+    )
+    optimize: int | None = Field(
+        default=None,
+        gt=0,
+        description="Compact the table in the background once it has at least N small files.",
+    )
+    vacuum: int | None = Field(
+        default=None,
+        gt=0,
+        description="Vacuum the table in the background once compactions have removed at least N files since the last vacuum, or, without optimize, every N batches.",
+    )
+    vacuum_retention_hours: int | None = Field(
+        default=None,
+        ge=0,
+        description="Retention in hours of the files removed from the table. Defaults to the retention of the table (7 days).",
+    )
+
+    @property
+    def delta_write_options(self) -> dict:
+        """Options of the writer, passed to `deltalake.write_deltalake`."""
+        options = {}
+        if self.partition_by:
+            options["partition_by"] = self.partition_by
+        if self.target_file_size is not None:
+            options["target_file_size"] = self.target_file_size
+        if self.max_row_group_size is not None:
+            options["writer_properties"] = WriterProperties(
+                max_row_group_size=self.max_row_group_size
+            )
+        return options
 
 
 class DuckDBSinkConfiguration(BaseModel):
     type_of_sink: Literal["duckdb"] = "duckdb"
     path: str
     table_name: str
+    create_table: bool = Field(
+        default=True,
+        description="Whether to create the table, with column types taken from the schema of the data, if it does not exist.",
+    )
 
 
 class PostgresSinkConfiguration(BaseModel):
     type_of_sink: Literal["postgres"] = "postgres"
     connection_string: str
     table_name: str
+    method: Literal["copy", "insert"] = Field(
+        default="copy",
+        description="How the batches are loaded: streamed with `COPY ... FROM STDIN` in the CSV format, or inserted with INSERT statements.",
+    )
+    create_table: bool = Field(
+        default=True,
+        description="Whether to create the table, with column types taken from the schema of the data, if it does not exist. Used by the `copy` method.",
+    )
+    staging: bool = Field(
+        default=False,
+        description="Whether to copy each batch into an UNLOGGED staging table first, and move it into the table in a single transaction. Used by the `copy` method.",
+    )
 
 
 class KafkaSinkConfiguration(BaseModel):
@@ -60,6 +223,76 @@ class KafkaSinkConfiguration(BaseModel):
         description="Configuration for the Kafka producer. Please refer to the [kafka-python documentation](https://kafka-python.readthedocs.io/en/master/apidoc/KafkaProducer.html) for available options.",
     )
     topic: str
+    key_field: str | None = Field(
+        default=None,
+        description="Column whose values are used as message keys, so that records with the same key are sent to the same partition.",
+    )
+    message_format: Literal["json", "avro", "arrow"] = Field(
+        default="json",
+        description="Format of the messages: one JSON object per record, or one Avro file or Arrow IPC stream per `max_records_per_message` records.",
+    )
+    max_records_per_message: int = Field(
+        default=1000,
+        gt=0,
+        description="Maximum number of records per message of the Avro and Arrow formats, so that the messages fit within the maximum request size of the producer.",
+    )
+    compression: Literal["gzip"] | None = Field(
+        default=None,
+        description="Compression of the batches of messages sent to the brokers. Other codecs require optional packages, see `compression_type` of the producer configuration.",
+    )
+    linger_ms: int | None = Field(
+        default=None,
+        ge=0,
+        description="Time in milliseconds the producer waits for more messages before sending a batch of messages.",
+    )
+    batch_size: int | None = Field(
+        default=None,
+        gt=0,
+        description="Maximum size in bytes of a batch of messages sent to a partition.",
+    )
+    wait_for_delivery: bool = Field(
+        default=False,
+        description="If True, waits until the messages of each batch are delivered before the next batch is scheduled.",
+    )
+
+    @model_validator(mode="after")
+    def validate_key_field(self) -> "KafkaSinkConfiguration":
+        if self.key_field is not None and self.message_format != "json":
+            raise ValueError("Message keys are supported for the JSON format only.")
+        return self
+
+    @property
+    def producer_kwargs(self) -> dict:
+        """The configuration of the producer, including the dedicated options."""
+        options = {
+            "compression_type": self.compression,
+            "linger_ms": self.linger_ms,
+            "batch_size": self.batch_size,
+        }
+        return {
+            **self.producer_config,
+            **{name: value for name, value in options.items() if value is not None},
+        }
+
+
+class IcebergPartitionField(BaseModel):
+    column: str
+    transform: str = Field(
+        default="identity",
+        description="Partition transform: identity, year, month, day, hour, bucket[N] or truncate[W].",
+    )
+
+    @field_validator("transform")
+    def validate_transform(cls, value: str) -> str:
+        transform = parse_transform(value)
+        if isinstance(transform, UnknownTransform | VoidTransform):
+            raise ValueError(f"Unsupported partition transform: '{value}'.")
+        return value
+
+
+class IcebergSortField(BaseModel):
+    column: str
+    descending: bool = False
 
 
 class IcebergSinkConfiguration(BaseModel):
@@ -68,6 +301,161 @@ class IcebergSinkConfiguration(BaseModel):
     catalog_properties: dict[str, str] = Field(
         default_factory=dict,
     )
+    partition_by: list[IcebergPartitionField] = Field(
+        default_factory=list,
+        description="Partition fields of the table, applied when the table is created.",
+    )
+    sort_by: list[IcebergSortField] = Field(
+        default_factory=list,
+        description="Sort order of the table, applied when the table is created. Each batch is sorted by it before it is written.",
+    )
+    target_file_size: int | None = Field(
+        default=None,
+        gt=0,
+        description="Target size in bytes of the data files, set as the `write.target-file-size-bytes` property of a created table. Files smaller than it are considered small. Defaults to the property of the table.",
+    )
+    compact: int | None = Field(
+        default=None,
+        gt=0,
+        description="Rewrite the small data files of the table in the background once N data files have been written since the last compaction.",
+    )
+    expire_snapshots: int | None = Field(
+        default=None,
+        gt=0,
+        description="Expire the old snapshots of the table in the background once it has N snapshots.",
+    )
+    retain_snapshots: int = Field(
+        default=1,
+        gt=0,
+        description="Number of the most recent snapshots kept when the snapshots are expired.",
+    )
+
+    @model_validator(mode="after")
+    def validate_retain_snapshots(self) -> "IcebergSinkConfiguration":
+        if (
+            self.expire_snapshots is not None
+            and self.retain_snapshots >= self.expire_snapshots
+        ):
+            raise ValueError("retain_snapshots must be lower than expire_snapshots.")
+        return self
+
+
+FILE_SINK_COMPRESSIONS: dict[str, set[str]] = {
+    "parquet": {"snappy", "gzip", "brotli", "lz4", "zstd", "none"},
+    "ipc": {"lz4", "zstd"},
+    "csv": {"gzip", "bz2", "brotli", "lz4", "zstd"},
+    "ndjson": {"gzip", "bz2", "brotli", "lz4", "zstd"},
+}
+
+
+class FileSinkConfiguration(BaseModel):
+    type_of_sink: Literal["file"] = "file"
+    path: str = Field(
+        description="Directory the files are written to: a local path, or an `s3://` or `gs://` URI.",
+    )
+    format: Literal["parquet", "ipc", "csv", "ndjson"] = "parquet"
+    compression: str | None = Field(
+        default=None,
+        description="Compression of the files. Parquet: snappy (default), gzip, brotli, lz4, zstd or none. Arrow IPC: lz4 or zstd. CSV and NDJSON: gzip, bz2, brotli, lz4 or zstd, applied to the whole file.",
+    )
+    row_group_size: int | None = Field(
+        default=None,
+        gt=0,
+        description="Maximum number of rows per row group (Parquet) or record batch (Arrow IPC).",
+    )
+    max_rows_per_file: int | None = Field(
+        default=None,
+        gt=0,
+        description="Start a new file once the current one has at least this many records.",
+    )
+    max_bytes_per_file: int | None = Field(
+        default=None,
+        gt=0,
+        description="Start a new file once at least this many bytes have been written to the current one.",
+    )
+    max_seconds_per_file: float | None = Field(
+        default=None,
+        gt=0,
+        description="Start a new file once the current one has been open for this many seconds.",
+    )
+
+    @model_validator(mode="after")
+    def validate_compression(self) -> "FileSinkConfiguration":
+        compressions = FILE_SINK_COMPRESSIONS[self.format]
+        if self.compression is not None and self.compression not in compressions:
+            raise ValueError(
+                f"Unsupported compression for the {self.format} format: '{self.compression}'. "
+                f"Supported compressions: {', '.join(sorted(compressions))}."
+            )
+        return self
+
+
+class FanOutSinkConfiguration(BaseModel):
+    type_of_sink: Literal["fan_out"] = "fan_out"
+    targets: list["SinkConfiguration"] = Field(
+        min_length=1,
+        description="The sinks every batch is written to, in parallel.",
+    )
+    isolate_errors: bool = Field(
+        default=True,
+        description="If true, a failing sink is closed and the stream goes on with the other sinks, until all of them fail. If false, the stream stops at the first error.",
+    )
+
+
+class SinkBufferConfiguration(BaseModel):
+    max_rows: int | None = Field(
+        default=None,
+        gt=0,
+        description="Write the buffered batches once they hold at least this many records.",
+    )
+    max_bytes: int | None = Field(
+        default=None,
+        gt=0,
+        description="Write the buffered batches once their estimated size reaches this many bytes.",
+    )
+    max_latency: float | None = Field(
+        default=None,
+        gt=0,
+        description="Write the buffered batches once the oldest of them has been buffered for this many seconds.",
+    )
+
+    @model_validator(mode="after")
+    def validate_limits(self) -> "SinkBufferConfiguration":
+        if (
+            self.max_rows is None
+            and self.max_bytes is None
+            and self.max_latency is None
+        ):
+            raise ValueError(
+                "At least one of max_rows, max_bytes or max_latency must be set."
+            )
+        return self
+
+
+class SinkSpoolConfiguration(BaseModel):
+    directory: str = Field(
+        description="The local directory the batches are spooled to. It must not be shared by several sinks.",
+    )
+    max_bytes: int | None = Field(
+        default=None,
+        gt=0,
+        description="The maximum size of the spool in bytes. Once it is full, the generation waits for the sink.",
+    )
+    max_retries: int | None = Field(
+        default=10,
+        ge=0,
+        description="The number of retries of a batch before the stream fails. If not set, batches are retried until the sink recovers.",
+    )
+    retry_backoff: float = Field(
+        default=1.0,
+        gt=0,
+        description="The delay before the first retry in seconds, doubled after each retry.",
+    )
+    max_retry_backoff: float = Field(
+        default=30.0,
+        gt=0,
+        description="The maximum delay between retries in seconds.",
+    )
 
 
 class SinkConfiguration(BaseModel):
@@ -77,6 +465,75 @@ class SinkConfiguration(BaseModel):
         | PostgresSinkConfiguration
         | KafkaSinkConfiguration
         | IcebergSinkConfiguration
+        | FileSinkConfiguration
+        | FanOutSinkConfiguration
     ) = Field(
         discriminator="type_of_sink",
     )
+    buffer: SinkBufferConfiguration | None = Field(
+        default=None,
+        description="If set, the batches are coalesced and written to the sink together.",
+    )
+    spool: SinkSpoolConfiguration | None = Field(
+        default=None,
+        description="If set, the batches are spooled to the local disk and written to the sink in the background.",
+    )
+
+
+FanOutSinkConfiguration.model_rebuild()
+
+
+class StreamConfiguration(BaseModel):
+    table: str = Field(description="Path to the table configuration.")
+    sink: str = Field(description="Path to the sink configuration.")
+    count: int = Field(gt=0, description="Number of records per batch.")
+    batches: int = Field(
+        description="Number of batches. If <= 0, batches are generated until stopped.",
+    )
+    interval: float | None = Field(
+        default=None,
+        ge=0,
+        description="Interval in seconds between the starts of consecutive batches.",
+    )
+    rows_per_second: float | None = Field(
+        default=None,
+        gt=0,
+        description="Target rate of records per second, instead of an interval.",
+    )
+    chunk_rows: int | None = Field(
+        default=None,
+        gt=0,
+        description="If set, each batch is generated and appended in chunks of at most this many records. The chunks are the shards generated in parallel, 100,000 records if not set.",
+    )
+    queue_depth: int = Field(
+        default=0,
+        ge=0,
+        description="If > 0, batches are generated while the previous ones are written.",
+    )
+    seed: int | None = Field(
+        default=None,
+        ge=0,
+        description="Overrides the seed of the table configuration.",
+    )
+
+    @model_validator(mode="after")
+    def validate_rate(self) -> "StreamConfiguration":
+        if (self.interval is None) == (self.rows_per_second is None):
+            raise ValueError(
+                "Exactly one of 'interval' and 'rows_per_second' must be provided."
+            )
+        return self
+
+
+class JobConfiguration(BaseModel):
+    workers: int = Field(
+        default=1,
+        ge=1,
+        description="Number of processes in the generation pool shared by all streams.",
+    )
+    max_keys: int = Field(
+        default=DEFAULT_MAX_KEYS,
+        gt=0,
+        description="Maximum number of keys kept per referenced column. Beyond it, a uniform sample of the keys is kept.",
+    )
+    streams: list[StreamConfiguration] = Field(min_length=1)
@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class RateScheduler:
+    """Schedules batches at a fixed rate.
+
+    Batches are due at `start + n * interval`, so the time spent generating and
+    writing a batch does not add up to the period. If a batch is late by more than
+    one interval, the missed ticks are dropped instead of being run back to back,
+    and the lag is reported.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            interval (float): The interval in seconds between batches.
+            clock (Callable[[], float]): The monotonic clock to measure time with.
+            sleep (Callable[[float], None]): The function to wait with.
+
+        Raises:
+            ValueError: If the interval is negative.
+
+        """
+        if interval < 0:
+            raise ValueError(f"Invalid interval: {interval}. It must not be negative.")
+
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+        self.started_at = clock()
+        self.next_tick = self.started_at
+        self.ticks = 0
+        self.dropped_ticks = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+    def wait(self, stop: threading.Event | None = None) -> bool:
+        """Wait until the next batch is due.
+
+        Args:
+            stop (threading.Event | None): If set, stops the stream: the wait ends
+                as soon as the event is set.
+
+        Returns:
+            bool: Whether the next batch is due, i.e. the stream was not stopped.
+
+        """
+        self.ticks += 1
+        self.next_tick += self.interval
+        now = self.clock()
+
+        if now <= self.next_tick:
+            self.lag = 0.0
+            if stop is not None:
+                return not stop.wait(self.next_tick - now)
+            self.sleep(self.next_tick - now)
+            return True
+
+        self.lag = now - self.next_tick
+        self.max_lag = max(self.max_lag, self.lag)
+        missed_ticks = int(self.lag // self.interval) if self.interval > 0 else 0
+        if missed_ticks > 0:
+            self.dropped_ticks += missed_ticks
+            self.next_tick += missed_ticks * self.interval
+            logger.warning(
+                "Falling behind the target rate by %.3f seconds. Dropped %d tick(s) (%d in total).",
+                self.lag,
+                missed_ticks,
+                self.dropped_ticks,
+            )
+        return stop is None or not stop.is_set()
+
+    def elapsed(self) -> float:
+        """The number of seconds since the scheduler was started."""
+        return self.clock() - self.started_at
+
+
+__all__ = ["RateScheduler"]
@@ -1,12 +1,14 @@
 import logging
+import threading
 
 import pydantic
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.routing import APIRoute
 
-from mimicry.data import generate_data
+from mimicry.cache import BatchCache
 from mimicry.exceptions import MimicryInvalidCountValueError
-from mimicry.models import TableConfiguration
+from mimicry.generator import TableGenerator
+from mimicry.models import FieldConfiguration, TableConfiguration
 
 logger = logging.getLogger(__name__)
 
@@ -48,27 +50,30 @@ def prepare_base_fastapi_app(
 
 def build_table_model(
     table: TableConfiguration,
-    strict: bool,
+    generator: TableGenerator,
 ) -> type[pydantic.BaseModel]:
     """Build a Pydantic model for the given table configuration.
     Args:
         table (TableConfiguration): The table configuration to build the model for.
-        strict (bool): Whether to enforce strict validation.
+        generator (TableGenerator): The compiled generator for the table.
     Returns:
         type[pydantic.BaseModel]: The Pydantic model class for the table.
     """
-    sample_data = generate_data(table, 1, strict).to_dicts()[0]
+
+    def field_type(field: FieldConfiguration) -> type:
+        python_type = generator.schema[field.name].to_python()
+        # fields with dirty data are nullable
+        return python_type | None if field.null_rate > 0 else python_type
 
     result_type = pydantic.create_model(
         table.name,
         __doc__=table.description,
         **{
             field.name: (
-                type(sample_data[field.name]),
+                field_type(field),
                 pydantic.Field(..., description=field.description),
             )
-            for field in table.fields
-            if field.name in sample_data
+            for field in generator.fields
         },
     )
 
@@ -76,23 +81,39 @@ def build_table_model(
 
 
 def build_api_route(
-    table: TableConfiguration, strict: bool, max_count: int
+    table: TableConfiguration,
+    strict: bool,
+    max_count: int,
+    cache: BatchCache | None = None,
 ) -> APIRoute:
     """
     Build an API route for the given table configuration.
     Args:
         table (TableConfiguration): The table configuration to build the route for.
         strict (bool): Whether to enforce strict validation. If True, raises an error if the table configuration is invalid.
+        max_count (int): The maximum number of records returned per request.
+        cache (BatchCache | None): The cache of generated batches, used if the table has a seed.
+            With the cache, the same records are returned for the same count.
     Returns:
         APIRoute: The FastAPI route for the table.
     """
-    result_type = build_table_model(table=table, strict=strict)
+    generator = TableGenerator(table=table, strict=strict, cache=cache)
+    result_type = build_table_model(table=table, generator=generator)
 
     route_path = f"/tables/{table.name}"
 
+    # with the cache, the batch of a count is generated once and then served from
+    # the cache, instead of a new batch being generated and cached per request
+    batch_idx = 1 if generator.cache is not None else None
+    # the endpoint is run in a thread pool, while the generator keeps the state of
+    # its random generators and batches, so requests generate one at a time
+    lock = threading.Lock()
+
     def endpoint_callable(count: int):
         count = min(count, max_count)
-        return generate_data(table=table, count=count, strict=strict).to_dicts()
+        with lock:
+            data = generator.generate(count=count, batch_idx=batch_idx)
+        return data.to_dicts()
 
     return APIRoute(
         path=route_path,
@@ -111,6 +132,7 @@ def build_fastapi_app(
     strict: bool,
     max_count: int,
     version: str = "1.0.0",
+    cache: BatchCache | None = None,
 ) -> FastAPI:
     """
     Build a FastAPI application with routes for the provided table configurations.
@@ -120,6 +142,7 @@ def build_fastapi_app(
         description (str): A description of the FastAPI application.
         strict (bool): If True, raises an error if the table configuration is invalid. If True, the application will not start if any table configuration is invalid.
         version (str): The version of the FastAPI application.
+        cache (BatchCache | None): The cache of generated batches, used for the tables with a seed.
     Returns:
         FastAPI: The FastAPI application instance with the built routes.
     Raises:
@@ -133,7 +156,9 @@ def build_fastapi_app(
     for table in tables:
         try:
             routes.append(
-                build_api_route(table=table, strict=strict, max_count=max_count)
+                build_api_route(
+                    table=table, strict=strict, max_count=max_count, cache=cache
+                )
             )
         except Exception as e:
             logger.error(
@@ -0,0 +1,1717 @@
+import io
+import logging
+import pathlib
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import cached_property, partial
+from typing import Self
+
+from kafka import KafkaProducer as Producer
+
+import duckdb
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+import sqlalchemy
+from deltalake import DeltaTable
+from psycopg2 import sql
+from pyiceberg.catalog import Catalog, load_catalog
+from pyiceberg.exceptions import CommitFailedException
+from pyiceberg.expressions import AlwaysTrue
+from pyiceberg.io.pyarrow import ArrowScan, _dataframe_to_data_files
+from pyiceberg.partitioning import (
+    PARTITION_FIELD_ID_START,
+    PartitionField,
+    PartitionSpec,
+)
+from pyiceberg.schema import assign_fresh_schema_ids
+from pyiceberg.table import Table as IcebergTable
+from pyiceberg.table import TableProperties
+from pyiceberg.table.snapshots import Snapshot
+from pyiceberg.table.sorting import NullOrder, SortDirection, SortField, SortOrder
+from pyiceberg.table.update import AssertTableUUID, RemoveSnapshotsUpdate
+from pyiceberg.transforms import IdentityTransform, parse_transform
+from pyiceberg.utils.properties import property_as_int
+
+from mimicry.filesystem import check_path_type
+from mimicry.models import (
+    DeltaLakeSinkConfiguration,
+    DuckDBSinkConfiguration,
+    FanOutSinkConfiguration,
+    FileSinkConfiguration,
+    IcebergPartitionField,
+    IcebergSinkConfiguration,
+    KafkaSinkConfiguration,
+    PostgresSinkConfiguration,
+    SinkBufferConfiguration,
+    SinkConfiguration,
+    SinkSpoolConfiguration,
+)
+from mimicry.utils import (
+    warn_about_missing_gcs_environment_variables,
+    warn_about_missing_s3_environment_variables,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def duckdb_identifier(name: str) -> str:
+    """Quote a table name, optionally qualified with its catalog and schema.
+
+    Args:
+        name (str): The table name, e.g. `table` or `schema.table`.
+
+    Returns:
+        str: The quoted identifier, safe to be used in a query.
+
+    """
+    return ".".join('"' + part.replace('"', '""') + '"' for part in name.split("."))
+
+
+def cast_categorical_columns(data: pl.DataFrame) -> pl.DataFrame:
+    """Cast Enum/Categorical columns to strings for sinks without dictionary types.
+
+    Parquet files written by such sinks are still dictionary-encoded.
+    """
+    return data.with_columns(pl.col(pl.Enum, pl.Categorical).cast(pl.String))
+
+
+class Batch:
+    """A batch of generated data handed over to the sinks.
+
+    The representations needed by the sinks are built on first use and cached, so
+    the data is converted at most once per batch, regardless of the sink. The Arrow
+    table keeps Enum columns dictionary-encoded, while the frame and the records
+    are built for sinks without dictionary types.
+    """
+
+    def __init__(self, data: pl.DataFrame, idx: int) -> None:
+        """Initialize the batch.
+
+        Args:
+            data (pl.DataFrame): The generated data.
+            idx (int): The index of the batch in the stream.
+
+        """
+        self.data = data
+        self.idx = idx
+
+    def __len__(self) -> int:
+        return self.data.height
+
+    @cached_property
+    def frame(self) -> pl.DataFrame:
+        """The data with categorical columns cast to strings."""
+        return cast_categorical_columns(self.data)
+
+    @cached_property
+    def arrow(self) -> pa.Table:
+        """The data as an Arrow table, with Enum columns dictionary-encoded.
+
+        Categorical columns are cast to strings, as their dictionaries differ from
+        batch to batch, unlike the ones of Enum columns, which Arrow IPC files and
+        streams cannot replace.
+        """
+        return self.data.with_columns(pl.col(pl.Categorical).cast(pl.String)).to_arrow()
+
+    @cached_property
+    def records(self) -> list[bytes]:
+        """The records of the data, each encoded as a JSON object."""
+        return (
+            self.frame.select(pl.struct(pl.all()).struct.json_encode().cast(pl.Binary))
+            .to_series()
+            .to_list()
+        )
+
+    def encode(self, *representations: str) -> None:
+        """Build representations of the batch ahead of their use.
+
+        The representations are cached without a lock, so a batch read by several
+        threads is encoded beforehand by the thread handing it over.
+
+        Args:
+            *representations (str): The representations to build, among `frame`,
+                `arrow` and `records`.
+
+        """
+        for name in representations:
+            # the cached property is built by reading it
+            getattr(self, name)
+
+
+class SinkSession(ABC):
+    """Session of a sink that stays open for the whole stream.
+
+    Connections, clients and table lookups are set up once when the session is
+    opened and reused by every batch written to it. Sessions are used as context
+    managers: entering opens the session, and exiting flushes and closes it.
+    """
+
+    def open(self) -> None:
+        """Set up the resources of the sink."""
+
+    @abstractmethod
+    def write(self, batch: Batch) -> None:
+        """Write a batch to the sink.
+
+        Args:
+            batch (Batch): The batch to write.
+
+        """
+
+    def flush(self) -> None:
+        """Make the batches written so far visible in the sink."""
+
+    def close(self) -> None:
+        """Release the resources of the sink."""
+
+    def __enter__(self) -> Self:
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, *args) -> None:
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
+
+
+class BackgroundWorker:
+    """Run the maintenance tasks of a sink in a background thread, one at a time."""
+
+    def __init__(self, name: str, description: str) -> None:
+        """Initialize the worker.
+
+        Args:
+            name (str): The name prefix of the thread.
+            description (str): The description of the maintained table, used in logs.
+
+        """
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.description = description
+        self.task: Future | None = None
+
+    @property
+    def busy(self) -> bool:
+        """Whether a task is running.
+
+        Raises:
+            Exception: The error of the previous task, if it failed.
+
+        """
+        if self.task is None:
+            return False
+        if not self.task.done():
+            return True
+        task, self.task = self.task, None
+        task.result()
+        return False
+
+    def submit(self, fn: Callable[[], None]) -> None:
+        """Start a task.
+
+        Args:
+            fn (Callable[[], None]): The task.
+
+        """
+        self.task = self.executor.submit(fn)
+
+    def close(self) -> None:
+        """Wait for the running task and stop the thread."""
+        self.executor.shutdown(wait=True)
+        if self.task is not None and (error := self.task.exception()) is not None:
+            logger.error("Failed to maintain %s: %s", self.description, error)
+        self.task = None
+
+
+DEFAULT_DELTA_TARGET_FILE_SIZE = 100 * 1024 * 1024
+
+
+class DeltaLakeSinkSession(SinkSession):
+    """Delta Lake sink that maintains the table in the background.
+
+    Batches are appended with the partitioning and file sizing of the sink. After
+    each batch, the files of the table are checked against the thresholds of the
+    sink, and the compaction (and vacuum) runs in a background thread against its
+    own handle of the table, while the stream keeps appending. Delta Lake resolves
+    the concurrent commits, as appends never conflict with a compaction. Without
+    compaction, the table is vacuumed every `vacuum` batches.
+    """
+
+    def __init__(self, config: DeltaLakeSinkConfiguration) -> None:
+        self.config = config
+        # the table is loaded once it exists, and then updated incrementally
+        self.table: DeltaTable | None = None
+        self.worker: BackgroundWorker | None = None
+        self.removed_files = 0
+        self.batches = 0
+
+    def open(self) -> None:
+        if self.config.optimize is not None or self.config.vacuum is not None:
+            self.worker = BackgroundWorker(
+                name="delta-maintenance",
+                description=f"Delta Lake table at '{self.config.path}'",
+            )
+
+    def write(self, batch: Batch) -> None:
+        options = self.config.delta_write_options
+        if self.table is None:
+            batch.frame.write_delta(
+                target=self.config.path, mode="append", delta_write_options=options
+            )
+            self.table = DeltaTable(self.config.path)
+        else:
+            batch.frame.write_delta(
+                target=self.table, mode="append", delta_write_options=options
+            )
+
+        self.batches += 1
+        if self.worker is None or self.worker.busy:
+            return
+        if self.config.optimize is not None:
+            small_files = self.count_small_files()
+            if small_files >= self.config.optimize:
+                logger.info(
+                    "Scheduling maintenance of Delta Lake table at '%s' with %d small file(s)",
+                    self.config.path,
+                    small_files,
+                )
+                self.worker.submit(self.maintain)
+        elif self.batches >= self.config.vacuum:
+            self.batches = 0
+            self.worker.submit(partial(self.vacuum, DeltaTable(self.config.path)))
+
+    def count_small_files(self) -> int:
+        """Count the files of the table smaller than the target file size."""
+        sizes = self.table.get_add_actions(flatten=True).column("size_bytes")
+        target_size = self.config.target_file_size or DEFAULT_DELTA_TARGET_FILE_SIZE
+        return pc.sum(pc.less(sizes, target_size)).as_py() or 0
+
+    def maintain(self) -> None:
+        """Compact the table, and vacuum it if enough files were removed."""
+        table = DeltaTable(self.config.path)
+        metrics = table.optimize.compact(target_size=self.config.target_file_size)
+        logger.info(
+            "Optimized Delta Lake table at '%s': %d file(s) added, %d file(s) removed",
+            self.config.path,
+            metrics["numFilesAdded"],
+            metrics["numFilesRemoved"],
+        )
+        self.removed_files += metrics["numFilesRemoved"]
+
+        if self.config.vacuum is not None and self.removed_files >= self.config.vacuum:
+            self.vacuum(table)
+            self.removed_files = 0
+
+    def vacuum(self, table: DeltaTable) -> None:
+        """Delete the files removed from the table past the retention."""
+        retention_hours = self.config.vacuum_retention_hours
+        deleted = table.vacuum(
+            retention_hours=retention_hours,
+            dry_run=False,
+            enforce_retention_duration=retention_hours is None,
+        )
+        logger.info(
+            "Vacuumed Delta Lake table at '%s': %d file(s) deleted",
+            self.config.path,
+            len(deleted),
+        )
+
+    def close(self) -> None:
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
+
+
+class DuckDBSinkSession(SinkSession):
+    """DuckDB sink that inserts the Arrow data of the batches without copying it.
+
+    Every batch is registered as a view over its Arrow table and inserted with
+    `INSERT INTO ... BY NAME SELECT`, which DuckDB scans in parallel. The table name
+    is quoted, so the table can be created from the schema of the data safely.
+    """
+
+    VIEW_NAME = "mimicry_batch"
+
+    def __init__(self, config: DuckDBSinkConfiguration) -> None:
+        self.config = config
+        self.conn: duckdb.DuckDBPyConnection | None = None
+        self.table = duckdb_identifier(config.table_name)
+        self.prepared = False
+
+    def open(self) -> None:
+        self.conn = duckdb.connect(self.config.path)
+
+    def write(self, batch: Batch) -> None:
+        self.conn.register(self.VIEW_NAME, batch.arrow)
+        try:
+            if not self.prepared:
+                if self.config.create_table:
+                    self.conn.execute(
+                        f"CREATE TABLE IF NOT EXISTS {self.table} AS SELECT * FROM {self.VIEW_NAME} LIMIT 0"
+                    )
+                self.prepared = True
+            # it raises the CatalogException if table is not created before the ingestion
+            self.conn.execute(
+                f"INSERT INTO {self.table} BY NAME SELECT * FROM {self.VIEW_NAME}"
+            )
+        finally:
+            self.conn.unregister(self.VIEW_NAME)
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+POSTGRES_COLUMN_TYPES: dict[type[pl.DataType], str] = {
+    pl.Boolean: "BOOLEAN",
+    pl.Int8: "SMALLINT",
+    pl.Int16: "SMALLINT",
+    pl.UInt8: "SMALLINT",
+    pl.Int32: "INTEGER",
+    pl.UInt16: "INTEGER",
+    pl.Int64: "BIGINT",
+    pl.UInt32: "BIGINT",
+    pl.UInt64: "NUMERIC(20)",
+    pl.Float32: "REAL",
+    pl.Float64: "DOUBLE PRECISION",
+    pl.String: "TEXT",
+    pl.Enum: "TEXT",
+    pl.Categorical: "TEXT",
+    pl.Null: "TEXT",
+    pl.Date: "DATE",
+    pl.Time: "TIME",
+}
+
+
+def postgres_column_type(dtype: pl.DataType) -> str:
+    """Map a Polars data type to the PostgreSQL type of a column.
+
+    Args:
+        dtype (pl.DataType): The Polars data type.
+
+    Returns:
+        str: The PostgreSQL column type.
+
+    Raises:
+        ValueError: If the data type has no PostgreSQL counterpart.
+
+    """
+    if isinstance(dtype, pl.Datetime):
+        return "TIMESTAMPTZ" if dtype.time_zone is not None else "TIMESTAMP"
+    if isinstance(dtype, pl.Decimal):
+        if dtype.precision is None:
+            return "NUMERIC"
+        return f"NUMERIC({dtype.precision}, {dtype.scale})"
+    try:
+        return POSTGRES_COLUMN_TYPES[dtype.base_type()]
+    except KeyError:
+        raise ValueError(f"Unsupported data type for PostgreSQL: {dtype}") from None
+
+
+def postgres_identifier(name: str) -> sql.Identifier:
+    """Quote a table name, optionally qualified with its schema (`schema.table`)."""
+    return sql.Identifier(*name.split("."))
+
+
+class PostgresSinkSession(SinkSession):
+    """PostgreSQL sink that streams the batches with `COPY ... FROM STDIN`.
+
+    Every batch is encoded once as CSV and copied in a single round trip, and
+    committed right away. With `staging` enabled, the batch is copied into an
+    UNLOGGED staging table first, which is not written to the WAL, and moved into
+    the table with `INSERT ... SELECT` in the same transaction. The `insert` method
+    keeps the former behaviour of inserting the rows through SQLAlchemy.
+    """
+
+    def __init__(self, config: PostgresSinkConfiguration) -> None:
+        self.config = config
+        self.engine: sqlalchemy.Engine | None = None
+        self.conn = None
+        self.prepared = False
+        self.staging_table: str | None = None
+
+    def open(self) -> None:
+        # the engine keeps a pool of connections reused by the batches
+        self.engine = sqlalchemy.create_engine(self.config.connection_string)
+        if self.config.method == "copy":
+            # the underlying psycopg2 connection, which supports COPY
+            self.conn = self.engine.raw_connection()
+
+    def prepare(self, schema: pl.Schema) -> None:
+        """Create the table and the staging table of the session, if enabled.
+
+        It is called before the first batch is copied.
+
+        Args:
+            schema (pl.Schema): The schema of the data.
+
+        Raises:
+            ValueError: If a column type has no PostgreSQL counterpart.
+
+        """
+        table = postgres_identifier(self.config.table_name)
+        with self.conn.cursor() as cursor:
+            if self.config.create_table:
+                columns = sql.SQL(", ").join(
+                    sql.SQL("{} {}").format(
+                        sql.Identifier(name),
+                        sql.SQL(postgres_column_type(dtype)),
+                    )
+                    for name, dtype in schema.items()
+                )
+                cursor.execute(
+                    sql.SQL("CREATE TABLE IF NOT EXISTS {} ({})").format(table, columns)
+                )
+            if self.config.staging:
+                # a table per session, so that concurrent streams do not share it
+                staging_table = (
+                    f"{self.config.table_name}_staging_{uuid.uuid4().hex[:8]}"
+                )
+                cursor.execute(
+                    sql.SQL(
+                        "CREATE UNLOGGED TABLE {} (LIKE {} INCLUDING DEFAULTS)"
+                    ).format(postgres_identifier(staging_table), table)
+                )
+                self.staging_table = staging_table
+        self.conn.commit()
+        self.prepared = True
+
+    def write(self, batch: Batch) -> None:
+        if self.config.method == "insert":
+            batch.frame.write_database(
+                connection=self.engine,
+                table_name=self.config.table_name,
+                if_table_exists="append",
+                engine="sqlalchemy",
+            )
+            return
+
+        data = batch.frame
+        buffer = io.BytesIO()
+        # nulls are written as unquoted empty fields, as expected by COPY
+        data.write_csv(buffer, include_header=False)
+        buffer.seek(0)
+
+        table = postgres_identifier(self.config.table_name)
+        columns = sql.SQL(", ").join(map(sql.Identifier, data.columns))
+        try:
+            if not self.prepared:
+                self.prepare(data.schema)
+            target = (
+                postgres_identifier(self.staging_table)
+                if self.staging_table is not None
+                else table
+            )
+            with self.conn.cursor() as cursor:
+                cursor.copy_expert(
+                    sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)")
+                    .format(target, columns)
+                    .as_string(cursor),
+                    buffer,
+                )
+                if self.staging_table is not None:
+                    cursor.execute(
+                        sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {}").format(
+                            table, columns, columns, target
+                        )
+                    )
+                    cursor.execute(sql.SQL("TRUNCATE {}").format(target))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def close(self) -> None:
+        if self.conn is not None:
+            try:
+                if self.staging_table is not None:
+                    with self.conn.cursor() as cursor:
+                        cursor.execute(
+                            sql.SQL("DROP TABLE IF EXISTS {}").format(
+                                postgres_identifier(self.staging_table)
+                            )
+                        )
+                    self.conn.commit()
+                    self.staging_table = None
+            finally:
+                self.conn.close()
+                self.conn = None
+        if self.engine is not None:
+            self.engine.dispose()
+            self.engine = None
+
+
+ICEBERG_COMMIT_RETRIES = 3
+ICEBERG_COMPACTION_RETRIES = 10
+
+
+def iceberg_partition_field_name(field: IcebergPartitionField) -> str:
+    """Name a partition field after its column and transform, e.g. `id_bucket_16`."""
+    if field.transform == "identity":
+        return field.column
+    transform = field.transform.replace("[", "_").removesuffix("]")
+    return f"{field.column}_{transform}"
+
+
+def iceberg_live_data_files(table: IcebergTable, snapshots: list[Snapshot]) -> set[str]:
+    """Collect the paths of the data files of the snapshots of a table.
+
+    Args:
+        table (IcebergTable): The table.
+        snapshots (list[Snapshot]): The snapshots of the table.
+
+    Returns:
+        set[str]: The paths of the data files, read once per manifest.
+
+    """
+    manifests = {
+        manifest.manifest_path: manifest
+        for snapshot in snapshots
+        for manifest in snapshot.manifests(table.io)
+    }
+    return {
+        entry.data_file.file_path
+        for manifest in manifests.values()
+        for entry in manifest.fetch_manifest_entry(table.io)
+    }
+
+
+class IcebergSinkSession(SinkSession):
+    """Iceberg sink that maintains the table in the background.
+
+    The table is created with the partition spec and sort order of the sink, and
+    each batch is sorted by the sort order before it is appended. As every append
+    commits a snapshot with new data files, a background thread rewrites the small
+    data files and expires the old snapshots on the thresholds of the sink, using
+    its own catalog. Commits that conflict with the maintenance are retried against
+    the refreshed table, so the stream is never paused.
+    """
+
+    def __init__(self, config: IcebergSinkConfiguration) -> None:
+        self.config = config
+        self.catalog: Catalog | None = None
+        self.table: IcebergTable | None = None
+        self.worker: BackgroundWorker | None = None
+        self.written_files = 0
+        # set by the maintenance when it commits to the table
+        self.table_changed = False
+
+    def open(self) -> None:
+        self.catalog = load_catalog(
+            "main",
+            **self.config.catalog_properties,
+        )
+        if self.config.compact is not None or self.config.expire_snapshots is not None:
+            self.worker = BackgroundWorker(
+                name="iceberg-maintenance",
+                description=f"Iceberg table '{self.config.table_name}'",
+            )
+
+    def create_table(self, schema: pa.Schema) -> None:
+        """Create the table with the partition spec and sort order of the sink.
+
+        Args:
+            schema (pa.Schema): The schema of the data.
+
+        Raises:
+            ValueError: If a partition or sort column is not in the schema.
+
+        """
+        iceberg_schema = assign_fresh_schema_ids(
+            Catalog._convert_schema_if_needed(schema)
+        )
+        partition_spec = PartitionSpec(
+            *(
+                PartitionField(
+                    source_id=iceberg_schema.find_field(field.column).field_id,
+                    field_id=PARTITION_FIELD_ID_START + i,
+                    transform=parse_transform(field.transform),
+                    name=iceberg_partition_field_name(field),
+                )
+                for i, field in enumerate(self.config.partition_by)
+            )
+        )
+        sort_order = SortOrder(
+            *(
+                SortField(
+                    source_id=iceberg_schema.find_field(field.column).field_id,
+                    transform=IdentityTransform(),
+                    direction=SortDirection.DESC
+                    if field.descending
+                    else SortDirection.ASC,
+                    null_order=NullOrder.NULLS_LAST
+                    if field.descending
+                    else NullOrder.NULLS_FIRST,
+                )
+                for field in self.config.sort_by
+            )
+        )
+        properties = {}
+        if self.config.target_file_size is not None:
+            properties[TableProperties.WRITE_TARGET_FILE_SIZE_BYTES] = str(
+                self.config.target_file_size
+            )
+        self.catalog.create_table(
+            identifier=self.config.table_name,
+            schema=iceberg_schema,
+            partition_spec=partition_spec,
+            sort_order=sort_order,
+            properties=properties,
+        )
+
+    def sort(self, data: pl.DataFrame) -> pl.DataFrame:
+        """Sort the data by the sort order of the sink."""
+        if not self.config.sort_by:
+            return data
+        descending = [field.descending for field in self.config.sort_by]
+        return data.sort(
+            by=[field.column for field in self.config.sort_by],
+            descending=descending,
+            nulls_last=descending,
+        )
+
+    def write(self, batch: Batch) -> None:
+        # Iceberg has no dictionary types
+        data = self.sort(batch.frame).to_arrow()
+        if self.table is None:
+            if not self.catalog.table_exists(self.config.table_name):
+                self.create_table(data.schema)
+            self.table = self.catalog.load_table(self.config.table_name)
+        elif self.table_changed:
+            self.table_changed = False
+            self.table.refresh()
+
+        for attempt in range(ICEBERG_COMMIT_RETRIES):
+            try:
+                # the table metadata is refreshed by each commit
+                self.table.append(data)
+                break
+            except CommitFailedException:
+                # the table was changed by the maintenance during the append, the
+                # data files of the failed attempt are left unreferenced
+                if attempt == ICEBERG_COMMIT_RETRIES - 1:
+                    raise
+                self.table.refresh()
+
+        if self.worker is not None:
+            summary = self.table.current_snapshot().summary
+            self.written_files += int(summary["added-data-files"])
+            if not self.worker.busy:
+                self.schedule_maintenance()
+
+    def schedule_maintenance(self) -> None:
+        """Start the maintenance of the table if a threshold is reached."""
+        compact = (
+            self.config.compact is not None
+            and self.written_files >= self.config.compact
+        )
+        expire = (
+            self.config.expire_snapshots is not None
+            and len(self.table.metadata.snapshots) >= self.config.expire_snapshots
+        )
+        if compact or expire:
+            if compact:
+                self.written_files = 0
+            self.worker.submit(partial(self.maintain, compact=compact, expire=expire))
+
+    def maintain(self, compact: bool, expire: bool) -> None:
+        """Compact the table and expire its snapshots.
+
+        Args:
+            compact (bool): Whether to rewrite the small data files.
+            expire (bool): Whether to expire the old snapshots.
+
+        """
+        # the catalog of the session is used by the stream
+        catalog = load_catalog("main", **self.config.catalog_properties)
+        table = catalog.load_table(self.config.table_name)
+        if compact:
+            self.compact(table)
+        if expire:
+            self.expire_snapshots(table)
+
+    def compact(self, table: IcebergTable) -> None:
+        """Rewrite the small data files of the table into files of the target size.
+
+        Args:
+            table (IcebergTable): The table, loaded by the maintenance.
+
+        """
+        target_size = self.config.target_file_size or property_as_int(
+            table.properties,
+            TableProperties.WRITE_TARGET_FILE_SIZE_BYTES,
+            TableProperties.WRITE_TARGET_FILE_SIZE_BYTES_DEFAULT,
+        )
+        spec_id = table.spec().spec_id
+        tasks = [
+            task
+            for task in table.scan().plan_files()
+            if not task.delete_files
+            and task.file.spec_id == spec_id
+            and task.file.file_size_in_bytes < target_size
+        ]
+        if len(tasks) < 2:
+            return
+
+        data = ArrowScan(
+            table.metadata, table.io, table.schema(), AlwaysTrue()
+        ).to_table(tasks)
+        if self.config.sort_by:
+            data = self.sort(pl.from_arrow(data)).to_arrow()
+        data_files = list(
+            _dataframe_to_data_files(
+                table_metadata=table.metadata, df=data, io=table.io
+            )
+        )
+        # only the commit is retried: the rewritten files can only be removed by the
+        # maintenance itself, so they are still in the table after a conflict
+        for attempt in range(ICEBERG_COMPACTION_RETRIES):
+            try:
+                with (
+                    table.transaction() as transaction,
+                    transaction.update_snapshot().overwrite() as rewrite,
+                ):
+                    for task in tasks:
+                        rewrite.delete_data_file(task.file)
+                    for data_file in data_files:
+                        rewrite.append_data_file(data_file)
+                self.table_changed = True
+                break
+            except CommitFailedException:
+                # the stream appended data since the table was loaded
+                if attempt == ICEBERG_COMPACTION_RETRIES - 1:
+                    logger.warning(
+                        "Skipped compaction of Iceberg table '%s' after conflicting commits",
+                        self.config.table_name,
+                    )
+                    for data_file in data_files:
+                        table.io.delete(data_file.file_path)
+                    return
+                table.refresh()
+
+        logger.info(
+            "Compacted Iceberg table '%s': %d small file(s) rewritten into %d file(s)",
+            self.config.table_name,
+            len(tasks),
+            len(data_files),
+        )
+
+    def expire_snapshots(self, table: IcebergTable) -> None:
+        """Expire all but the most recent snapshots of the table.
+
+        The data files referenced only by the expired snapshots are deleted, while
+        their metadata files are kept, as the stream may still be reading them.
+
+        Args:
+            table (IcebergTable): The table, loaded by the maintenance.
+
+        """
+        snapshots = sorted(
+            table.snapshots(), key=lambda snapshot: snapshot.timestamp_ms
+        )
+        referenced = {ref.snapshot_id for ref in table.metadata.refs.values()}
+        expired = [
+            snapshot
+            for snapshot in snapshots[: -self.config.retain_snapshots]
+            if snapshot.snapshot_id not in referenced
+        ]
+        if not expired:
+            return
+        retained = [snapshot for snapshot in snapshots if snapshot not in expired]
+        data_files = iceberg_live_data_files(table, expired) - iceberg_live_data_files(
+            table, retained
+        )
+
+        table.catalog.commit_table(
+            table,
+            requirements=(AssertTableUUID(uuid=table.metadata.table_uuid),),
+            updates=(
+                RemoveSnapshotsUpdate(
+                    snapshot_ids=[snapshot.snapshot_id for snapshot in expired]
+                ),
+            ),
+        )
+        self.table_changed = True
+        for path in data_files:
+            table.io.delete(path)
+        logger.info(
+            "Expired %d snapshot(s) of Iceberg table '%s': %d data file(s) deleted",
+            len(expired),
+            self.config.table_name,
+            len(data_files),
+        )
+
+    def close(self) -> None:
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
+
+
+class KafkaSinkSession(SinkSession):
+    """Kafka sink that sends the messages of a batch without waiting for them.
+
+    The producer sends the messages in the background, batched by partition as set
+    by `linger_ms` and `batch_size`. Delivery errors are collected by callbacks and
+    raised when the session is flushed, so a failing stream stops at the next batch,
+    or when it is closed, for the messages delivered at the end of the stream.
+    """
+
+    def __init__(self, config: KafkaSinkConfiguration) -> None:
+        self.config = config
+        self.producer: Producer | None = None
+        self.errors: list[Exception] = []
+        self.sent = 0
+
+    def open(self) -> None:
+        self.producer = Producer(**self.config.producer_kwargs)
+
+    def encode(self, batch: Batch) -> tuple[list[bytes | None], list[bytes]]:
+        """Encode a batch into the keys and values of its messages.
+
+        Args:
+            batch (Batch): The batch to encode.
+
+        Returns:
+            tuple[list[bytes | None], list[bytes]]: The keys and the values of the
+                messages. The keys are None if no key field is set.
+
+        """
+        # the Avro and Arrow formats send many records per message
+        offsets = range(0, len(batch), self.config.max_records_per_message)
+        match self.config.message_format:
+            case "json":
+                values = batch.records
+            case "avro":
+                values = []
+                for offset in offsets:
+                    buffer = io.BytesIO()
+                    batch.frame.slice(
+                        offset, self.config.max_records_per_message
+                    ).write_avro(buffer)
+                    values.append(buffer.getvalue())
+            case "arrow":
+                values = []
+                for offset in offsets:
+                    sink = pa.BufferOutputStream()
+                    with pa.ipc.new_stream(sink, batch.arrow.schema) as writer:
+                        writer.write_table(
+                            batch.arrow.slice(
+                                offset, self.config.max_records_per_message
+                            )
+                        )
+                    values.append(sink.getvalue().to_pybytes())
+
+        if self.config.key_field is None:
+            return [None] * len(values), values
+        keys = batch.frame[self.config.key_field].cast(pl.String).cast(pl.Binary)
+        return keys.to_list(), values
+
+    def write(self, batch: Batch) -> None:
+        send = self.producer.send
+        topic = self.config.topic
+        for key, value in zip(*self.encode(batch)):
+            send(topic, key=key, value=value).add_errback(self.errors.append)
+            self.sent += 1
+
+    def flush(self) -> None:
+        if self.config.wait_for_delivery:
+            self.producer.flush()
+        if self.errors:
+            logger.error(
+                "Failed to deliver %d of %d message(s) to topic '%s'.",
+                len(self.errors),
+                self.sent,
+                self.config.topic,
+            )
+            raise self.errors[0]
+
+    def close(self) -> None:
+        if self.producer is not None:
+            # waits for the messages that are still being sent
+            try:
+                self.producer.flush()
+            finally:
+                self.producer.close()
+                self.producer = None
+        if self.errors:
+            logger.error(
+                "Failed to deliver %d of %d message(s) to topic '%s': %s",
+                len(self.errors),
+                self.sent,
+                self.config.topic,
+                self.errors[0],
+            )
+            # the messages are lost, so the stream fails even if it is complete
+            raise self.errors[0]
+
+
+FILE_EXTENSIONS = {
+    "parquet": "parquet",
+    "ipc": "arrow",
+    "csv": "csv",
+    "ndjson": "ndjson",
+}
+COMPRESSION_EXTENSIONS = {
+    "gzip": "gz",
+    "bz2": "bz2",
+    "brotli": "br",
+    "lz4": "lz4",
+    "zstd": "zst",
+}
+
+
+def open_file_system(path: str) -> tuple[pafs.FileSystem, str]:
+    """Resolve the file system of a path.
+
+    Args:
+        path (str): A local path, or an `s3://` or `gs://` URI.
+
+    Returns:
+        tuple[pafs.FileSystem, str]: The file system and the path within it.
+
+    """
+    match check_path_type(path):
+        case "s3":
+            warn_about_missing_s3_environment_variables()
+            return pafs.S3FileSystem(), path.removeprefix("s3://")
+        case "gcs":
+            warn_about_missing_gcs_environment_variables()
+            return pafs.GcsFileSystem(), path.removeprefix("gs://")
+        case _:
+            return pafs.LocalFileSystem(), pathlib.Path(
+                path
+            ).expanduser().resolve().as_posix()
+
+
+class FileSinkSession(SinkSession):
+    """File sink that streams the batches into rolling files.
+
+    The batches are written incrementally to the current file, which is rolled over
+    to a new one by row count, size or age. Only the open file is held by the
+    writer, so datasets of any size can be written. The files are named
+    `part-<session>-<index>.<extension>`, and a file becomes visible once it is
+    rolled over or the stream ends: local files are written under a hidden name and
+    renamed, and objects are uploaded when they are closed.
+    """
+
+    def __init__(self, config: FileSinkConfiguration) -> None:
+        self.config = config
+        self.filesystem: pafs.FileSystem | None = None
+        self.directory = ""
+        self.prefix = f"part-{uuid.uuid4().hex[:8]}"
+        self.files = 0
+        self.stream: pa.NativeFile | None = None
+        self.writer: (
+            pq.ParquetWriter | pa.RecordBatchFileWriter | pacsv.CSVWriter | None
+        ) = None
+        self.path = ""
+        self.tmp_path = ""
+        self.rows = 0
+        self.opened_at = 0.0
+
+    def open(self) -> None:
+        self.filesystem, self.directory = open_file_system(self.config.path)
+        self.filesystem.create_dir(self.directory, recursive=True)
+
+    @property
+    def extension(self) -> str:
+        """The extension of the files, including the compression of text files."""
+        extension = FILE_EXTENSIONS[self.config.format]
+        if self.config.format in ("csv", "ndjson") and self.config.compression:
+            extension += f".{COMPRESSION_EXTENSIONS[self.config.compression]}"
+        return extension
+
+    def open_file(self, schema: pa.Schema) -> None:
+        """Open the next file and its writer.
+
+        Args:
+            schema (pa.Schema): The schema of the data.
+
+        """
+        name = f"{self.prefix}-{self.files:05d}.{self.extension}"
+        self.path = f"{self.directory}/{name}"
+        # local files are renamed when they are complete
+        is_local = isinstance(self.filesystem, pafs.LocalFileSystem)
+        self.tmp_path = f"{self.directory}/.{name}.tmp" if is_local else self.path
+        self.files += 1
+        self.rows = 0
+        self.opened_at = time.monotonic()
+
+        text_compression = (
+            self.config.compression if self.config.format in ("csv", "ndjson") else None
+        )
+        self.stream = self.filesystem.open_output_stream(
+            self.tmp_path, compression=text_compression
+        )
+        match self.config.format:
+            case "parquet":
+                self.writer = pq.ParquetWriter(
+                    self.stream, schema, compression=self.config.compression or "snappy"
+                )
+            case "ipc":
+                self.writer = pa.ipc.new_file(
+                    self.stream,
+                    schema,
+                    options=pa.ipc.IpcWriteOptions(compression=self.config.compression),
+                )
+            case "csv":
+                self.writer = pacsv.CSVWriter(self.stream, schema)
+            case "ndjson":
+                self.writer = None
+
+    def write(self, batch: Batch) -> None:
+        if self.stream is None:
+            self.open_file(batch.arrow.schema)
+
+        match self.config.format:
+            case "parquet":
+                self.writer.write_table(
+                    batch.arrow, row_group_size=self.config.row_group_size
+                )
+            case "ipc":
+                self.writer.write_table(
+                    batch.arrow, max_chunksize=self.config.row_group_size
+                )
+            case "csv":
+                self.writer.write_table(batch.arrow)
+            case "ndjson":
+                self.stream.write(b"\n".join(batch.records) + b"\n")
+        self.rows += len(batch)
+
+        if (
+            (
+                self.config.max_rows_per_file is not None
+                and self.rows >= self.config.max_rows_per_file
+            )
+            or (
+                self.config.max_bytes_per_file is not None
+                and self.stream.tell() >= self.config.max_bytes_per_file
+            )
+            or (
+                self.config.max_seconds_per_file is not None
+                and time.monotonic() - self.opened_at
+                >= self.config.max_seconds_per_file
+            )
+        ):
+            self.close_file()
+
+    def close_file(self) -> None:
+        """Complete the current file."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.stream.close()
+        self.stream = None
+        if self.tmp_path != self.path:
+            self.filesystem.move(self.tmp_path, self.path)
+        logger.info("Wrote %d records to '%s'", self.rows, self.path)
+
+    def close(self) -> None:
+        if self.stream is not None:
+            self.close_file()
+
+
+class CoalescingSinkSession(SinkSession):
+    """Session that coalesces the batches written to another session.
+
+    The batches are buffered and written to the sink as a single batch, and made
+    visible with a single flush, once the buffer holds `max_rows` records or
+    `max_bytes` bytes, or its oldest batch has been buffered for `max_latency`
+    seconds, whichever comes first. The latency is checked whenever a batch is
+    written or flushed, i.e. at least once per batch of the stream. Hence each
+    commit of the sink (a file, a snapshot, a transaction) carries many batches,
+    while the records are still delivered at the rate of the stream.
+    """
+
+    def __init__(
+        self,
+        session: SinkSession,
+        config: SinkBufferConfiguration,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the session.
+
+        Args:
+            session (SinkSession): The session of the sink the batches are written to.
+            config (SinkBufferConfiguration): The limits of the buffer.
+            clock (Callable[[], float]): The clock measuring the latency, in seconds.
+
+        """
+        self.session = session
+        self.config = config
+        self.clock = clock
+        self.batches: list[Batch] = []
+        self.rows = 0
+        self.bytes = 0
+        self.buffered_at: float | None = None
+        self.writes = 0
+
+    def open(self) -> None:
+        self.session.open()
+
+    def write(self, batch: Batch) -> None:
+        if not self.batches:
+            self.buffered_at = self.clock()
+        self.batches.append(batch)
+        self.rows += len(batch)
+        self.bytes += batch.data.estimated_size()
+
+        if (
+            (self.config.max_rows is not None and self.rows >= self.config.max_rows)
+            or (
+                self.config.max_bytes is not None
+                and self.bytes >= self.config.max_bytes
+            )
+            or self.is_late()
+        ):
+            self.drain()
+
+    def flush(self) -> None:
+        if self.is_late():
+            self.drain()
+
+    def is_late(self) -> bool:
+        """Whether the oldest buffered batch has been buffered for `max_latency`."""
+        return (
+            bool(self.batches)
+            and self.config.max_latency is not None
+            and self.clock() - self.buffered_at >= self.config.max_latency
+        )
+
+    def drain(self) -> None:
+        """Write the buffered batches to the sink as a single batch."""
+        if not self.batches:
+            return
+        batches, self.batches = self.batches, []
+        logger.debug(
+            "Writing %d buffered batch(es) with %d records to the sink",
+            len(batches),
+            self.rows,
+        )
+        self.rows = 0
+        self.bytes = 0
+        self.buffered_at = None
+
+        data = pl.concat([batch.data for batch in batches], rechunk=False)
+        self.session.write(Batch(data=data, idx=batches[-1].idx))
+        self.session.flush()
+        self.writes += 1
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __exit__(self, exc_type, *args) -> None:
+        try:
+            # the buffered batches are written when the stream is stopped, too
+            if exc_type is None or issubclass(exc_type, KeyboardInterrupt):
+                self.drain()
+                logger.info("Coalesced the batches into %d write(s)", self.writes)
+        finally:
+            self.session.__exit__(exc_type, *args)
+
+
+def sink_batch_representations(sink: SinkConfiguration) -> set[str]:
+    """The representations of the batches a sink reads when they are written.
+
+    Args:
+        sink (SinkConfiguration): The sink configuration.
+
+    Returns:
+        set[str]: The names of the representations, see `Batch`. Buffered sinks
+            write batches of their own, so they read none of them.
+
+    """
+    if sink.buffer is not None:
+        return set()
+    if sink.spool is not None:
+        return {"arrow"}
+    match sink.configuration:
+        case DuckDBSinkConfiguration():
+            return {"arrow"}
+        case FileSinkConfiguration(format="ndjson"):
+            return {"records"}
+        case FileSinkConfiguration():
+            return {"arrow"}
+        case KafkaSinkConfiguration(message_format=message_format, key_field=key):
+            encoded = {"json": "records", "avro": "frame", "arrow": "arrow"}
+            return {encoded[message_format]} | ({"frame"} if key is not None else set())
+        case FanOutSinkConfiguration(targets=targets):
+            return set().union(*map(sink_batch_representations, targets))
+    return {"frame"}
+
+
+class FanOutTarget:
+    """A sink of the fan-out, with its session and statistics."""
+
+    def __init__(self, name: str, session: SinkSession) -> None:
+        self.name = name
+        self.session = session
+        self.batches = 0
+        self.seconds = 0.0
+        self.error: BaseException | None = None
+
+
+class FanOutSinkSession(SinkSession):
+    """Session that writes every batch to several sinks in parallel.
+
+    Each batch is generated once and handed over to all sinks, each written in its
+    own thread, so all sinks receive identical data. The batch is converted to
+    Arrow, and to JSON records if a sink needs them, before it is handed over, so
+    the sinks only read the shared representations. With `isolate_errors`, a sink that fails
+    is closed and the stream goes on with the other sinks, until all of them fail.
+    The time spent by each sink is logged when the session is closed.
+    """
+
+    def __init__(self, config: FanOutSinkConfiguration) -> None:
+        self.config = config
+        self.targets = [
+            FanOutTarget(
+                name=f"{idx}:{target.configuration.type_of_sink}",
+                session=open_sink_session(target),
+            )
+            for idx, target in enumerate(config.targets)
+        ]
+        # the representations read by the sinks are built before the batch is shared
+        self.representations = set().union(
+            *map(sink_batch_representations, config.targets)
+        )
+        self.executor: ThreadPoolExecutor | None = None
+
+    @property
+    def active_targets(self) -> list[FanOutTarget]:
+        """The sinks that have not failed."""
+        return [target for target in self.targets if target.error is None]
+
+    def run(
+        self, action: Callable[[SinkSession], None], close_failed: bool = True
+    ) -> None:
+        """Run an action on the session of every active sink in parallel.
+
+        Args:
+            action (Callable[[SinkSession], None]): The action.
+            close_failed (bool): Whether to close the sessions of the failed sinks.
+
+        Raises:
+            Exception: The error of a sink if errors are not isolated, or the first
+                error if all sinks failed.
+
+        """
+
+        def run_target(target: FanOutTarget) -> None:
+            start = time.perf_counter()
+            try:
+                action(target.session)
+            finally:
+                target.seconds += time.perf_counter() - start
+
+        targets = self.active_targets
+        futures = [self.executor.submit(run_target, target) for target in targets]
+        # all sinks complete the action, even if one of them fails
+        wait(futures)
+        for target, future in zip(targets, futures):
+            if (error := future.exception()) is None:
+                continue
+            if not self.config.isolate_errors:
+                raise error
+            logger.error("Sink %s failed: %s", target.name, error)
+            target.error = error
+            if close_failed:
+                self.close_target(target)
+
+        if not self.active_targets:
+            raise self.targets[0].error
+
+    @staticmethod
+    def close_target(target: FanOutTarget) -> None:
+        """Close the session of a failed sink, without flushing it."""
+        error = target.error
+        try:
+            target.session.__exit__(type(error), error, error.__traceback__)
+        except Exception as close_error:
+            logger.error("Failed to close sink %s: %s", target.name, close_error)
+
+    def open(self) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=len(self.targets), thread_name_prefix="sink"
+        )
+        try:
+            self.run(lambda session: session.open())
+        except BaseException as error:
+            # the session is not entered, so the opened sinks are closed here
+            self.__exit__(type(error), error, error.__traceback__)
+            raise
+
+    def write(self, batch: Batch) -> None:
+        batch.encode(*self.representations)
+        self.run(lambda session: session.write(batch))
+        for target in self.active_targets:
+            target.batches += 1
+
+    def flush(self) -> None:
+        self.run(lambda session: session.flush())
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if self.executor is not None:
+                # sinks are closed as they would be on their own
+                self.run(
+                    lambda session: session.__exit__(exc_type, exc_value, traceback),
+                    close_failed=False,
+                )
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+            for target in self.targets:
+                logger.info(
+                    "Sink %s wrote %d batch(es) in %.3f seconds%s",
+                    target.name,
+                    target.batches,
+                    target.seconds,
+                    " before it failed" if target.error is not None else "",
+                )
+
+
+class SpoolingSinkSession(SinkSession):
+    """Session that spools the batches to the local disk and drains them to a sink.
+
+    Every flushed batch is written to an Arrow IPC file in the spool directory, and
+    a background thread replays the files to the sink in order, deleting each file
+    once the sink has flushed it. A failed write is retried with an exponential
+    backoff, on a new session of the sink, so the generation keeps its pace while
+    the sink is slow or unavailable. The batches are delivered at least once: a
+    batch that failed midway may be written again. Once the spool holds
+    `max_bytes`, the generation waits for the sink. Batches left in the spool when
+    the stream stops are replayed when it is restarted with the same spool.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], SinkSession],
+        config: SinkSpoolConfiguration,
+    ) -> None:
+        """Initialize the session.
+
+        Args:
+            factory (Callable[[], SinkSession]): Creates a session of the sink, for
+                the first write and again after a failed write.
+            config (SinkSpoolConfiguration): The configuration of the spool.
+
+        """
+        self.factory = factory
+        self.config = config
+        self.directory = pathlib.Path(config.directory).expanduser()
+        self.session: SinkSession | None = None
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        self.closing = False
+        self.pending: deque[pathlib.Path] = deque()
+        self.bytes = 0
+        self.max_depth = 0
+        self.max_spooled_bytes = 0
+        self.replayed = 0
+        self.retries = 0
+        self.seq = 0
+        self.writer: pa.ipc.RecordBatchFileWriter | None = None
+        self.spooling_path: pathlib.Path | None = None
+        self.spooling_idx = 0
+        self.spooling_bytes = 0
+        self.executor: ThreadPoolExecutor | None = None
+        self.drainer: Future | None = None
+
+    @property
+    def depth(self) -> int:
+        """The number of batches in the spool, waiting to be written to the sink."""
+        return len(self.pending)
+
+    def open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in self.directory.glob(".*.arrow.tmp"):
+            # batches that were not completely spooled when the stream stopped
+            path.unlink()
+        self.pending.extend(sorted(self.directory.glob("*.arrow")))
+        self.bytes = sum(path.stat().st_size for path in self.pending)
+        self.max_depth = self.depth
+        self.max_spooled_bytes = self.bytes
+        if self.pending:
+            self.seq = int(self.pending[-1].name.split("-")[0]) + 1
+            logger.info(
+                "Replaying %d batch(es) left in the spool at '%s'",
+                self.depth,
+                self.directory,
+            )
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spool")
+        self.drainer = self.executor.submit(self.drain)
+
+    def check_drainer(self) -> None:
+        """Raise the error of the background thread, if it failed."""
+        if self.drainer.done():
+            self.drainer.result()
+
+    def write(self, batch: Batch) -> None:
+        self.check_drainer()
+        table = batch.arrow
+        with self.condition:
+            if self.is_full():
+                logger.warning(
+                    "The spool at '%s' is full with %d batch(es), waiting for the sink",
+                    self.directory,
+                    self.depth,
+                )
+                while self.is_full() and not self.drainer.done():
+                    self.condition.wait()
+        self.check_drainer()
+
+        if self.writer is None:
+            self.spooling_path = self.directory / f".{self.seq:012d}.arrow.tmp"
+            self.writer = pa.ipc.new_file(str(self.spooling_path), table.schema)
+        self.writer.write_table(table)
+        self.spooling_idx = batch.idx
+        self.spooling_bytes += table.nbytes
+
+    def is_full(self) -> bool:
+        """Whether the spool holds `max_bytes`, while the sink can still drain it."""
+        return (
+            self.config.max_bytes is not None
+            and bool(self.pending)
+            and self.bytes + self.spooling_bytes >= self.config.max_bytes
+        )
+
+    def flush(self) -> None:
+        if self.writer is None:
+            return
+        self.writer.close()
+        self.writer = None
+        path = self.directory / f"{self.seq:012d}-{self.spooling_idx}.arrow"
+        self.spooling_path.replace(path)
+        self.seq += 1
+        self.spooling_bytes = 0
+
+        with self.condition:
+            self.pending.append(path)
+            self.bytes += path.stat().st_size
+            self.max_depth = max(self.max_depth, self.depth)
+            self.max_spooled_bytes = max(self.max_spooled_bytes, self.bytes)
+            self.condition.notify_all()
+        logger.debug(
+            "Spooled batch %d, %d batch(es) and %d bytes in the spool",
+            self.spooling_idx,
+            self.depth,
+            self.bytes,
+        )
+
+    def drain(self) -> None:
+        """Replay the spooled batches to the sink until the session is closed."""
+        try:
+            while True:
+                with self.condition:
+                    while not self.pending and not self.closing:
+                        self.condition.wait()
+                    if not self.pending or self.stopped.is_set():
+                        return
+                    path = self.pending[0]
+
+                size = path.stat().st_size
+                if not self.replay(path):
+                    return
+                path.unlink()
+                self.replayed += 1
+
+                with self.condition:
+                    self.pending.popleft()
+                    self.bytes -= size
+                    self.condition.notify_all()
+        finally:
+            with self.condition:
+                # wake up the generation waiting for the spool
+                self.condition.notify_all()
+            if self.session is not None:
+                self.session.__exit__(None, None, None)
+                self.session = None
+
+    def replay(self, path: pathlib.Path) -> bool:
+        """Write a spooled batch to the sink, retrying on failure.
+
+        Args:
+            path (pathlib.Path): The file of the batch.
+
+        Returns:
+            bool: Whether the batch was written, i.e. the session was not stopped.
+
+        Raises:
+            Exception: The error of the last retry, once the retries are exhausted.
+
+        """
+        idx = int(path.stem.split("-")[1])
+        attempt = 0
+        while True:
+            try:
+                if self.session is None:
+                    self.session = self.factory()
+                    self.session.open()
+                with pa.memory_map(str(path)) as source:
+                    table = pa.ipc.open_file(source).read_all()
+                self.session.write(Batch(data=pl.from_arrow(table), idx=idx))
+                self.session.flush()
+                return True
+            except Exception as error:
+                session, self.session = self.session, None
+                if session is not None:
+                    try:
+                        session.__exit__(type(error), error, error.__traceback__)
+                    except Exception as close_error:
+                        logger.error("Failed to close the sink: %s", close_error)
+                if (
+                    self.config.max_retries is not None
+                    and attempt >= self.config.max_retries
+                ):
+                    raise
+
+                delay = min(
+                    self.config.retry_backoff * 2**attempt,
+                    self.config.max_retry_backoff,
+                )
+                attempt += 1
+                self.retries += 1
+                logger.warning(
+                    "Failed to write spooled batch %d to the sink, retry %d in %.1f seconds: %s",
+                    idx,
+                    attempt,
+                    delay,
+                    error,
+                )
+                if self.stopped.wait(delay):
+                    return False
+
+    def stop(self) -> None:
+        """Stop the background thread after the batch being written."""
+        self.stopped.set()
+        with self.condition:
+            self.condition.notify_all()
+
+    def __exit__(self, exc_type, *args) -> None:
+        try:
+            # the spooled batches are kept when the stream is stopped, too
+            if exc_type is None or issubclass(exc_type, KeyboardInterrupt):
+                self.flush()
+            elif self.writer is not None:
+                self.writer.close()
+                self.spooling_path.unlink()
+        finally:
+            if self.executor is not None:
+                self.close_drainer(stop=exc_type is not None)
+
+        if exc_type is None:
+            self.check_drainer()
+
+    def close_drainer(self, stop: bool) -> None:
+        """Wait for the background thread to drain the spool, or stop it.
+
+        Args:
+            stop (bool): Whether to stop after the batch being written, keeping the
+                rest of the batches in the spool.
+
+        """
+        if stop:
+            self.stop()
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        try:
+            self.executor.shutdown(wait=True)
+        except KeyboardInterrupt:
+            self.stop()
+            self.executor.shutdown(wait=True)
+            raise
+        finally:
+            if (error := self.drainer.exception()) is not None:
+                logger.error("Failed to drain the spool: %s", error)
+            logger.info(
+                "Replayed %d batch(es) from the spool with %d retries, "
+                "max depth %d batch(es) and %d bytes",
+                self.replayed,
+                self.retries,
+                self.max_depth,
+                self.max_spooled_bytes,
+            )
+            if self.pending:
+                logger.warning(
+                    "%d batch(es) left in the spool at '%s', replayed when the stream is restarted",
+                    self.depth,
+                    self.directory,
+                )
+
+
+def create_sink_session(sink: SinkConfiguration) -> SinkSession:
+    """Create the session of a sink without the buffer.
+
+    Args:
+        sink (SinkConfiguration): The sink configuration.
+
+    Returns:
+        SinkSession: The session of the sink.
+
+    Raises:
+        ValueError: If the sink type is not supported.
+
+    """
+    match sink.configuration.type_of_sink:
+        case "delta_lake":
+            return DeltaLakeSinkSession(config=sink.configuration)
+        case "duckdb":
+            return DuckDBSinkSession(config=sink.configuration)
+        case "postgres":
+            return PostgresSinkSession(config=sink.configuration)
+        case "iceberg":
+            return IcebergSinkSession(config=sink.configuration)
+        case "kafka":
+            return KafkaSinkSession(config=sink.configuration)
+        case "file":
+            return FileSinkSession(config=sink.configuration)
+        case "fan_out":
+            return FanOutSinkSession(config=sink.configuration)
+        case _:
+            raise ValueError(
+                f"Unsupported sink type: {sink.configuration.type_of_sink}",
+            )
+
+
+def open_sink_session(sink: SinkConfiguration) -> SinkSession:
+    """Create the session of a sink, with its buffer and spool if it has them.
+
+    The batches are coalesced before they are spooled, so the spool holds the
+    batches as they are written to the sink.
+
+    Args:
+        sink (SinkConfiguration): The sink configuration.
+
+    Returns:
+        SinkSession: The session, to be opened by entering it as a context manager.
+
+    Raises:
+        ValueError: If the sink type is not supported.
+
+    """
+    if sink.spool is None:
+        session = create_sink_session(sink)
+    else:
+        session = SpoolingSinkSession(
+            factory=partial(create_sink_session, sink), config=sink.spool
+        )
+    if sink.buffer is not None:
+        session = CoalescingSinkSession(session=session, config=sink.buffer)
+    return session
+
+
+__all__ = ["Batch", "SinkSession", "open_sink_session"]
@@ -1,9 +1,14 @@
 import logging
 import os
+import queue
+import threading
+from collections.abc import Iterator
 from typing import Iterable
 
 logger = logging.getLogger(__name__)
 
+_END_OF_ITEMS = object()
+
 
 def warn_about_missing_environment_variables(
     *env_vars: Iterable[str], reason: str
@@ -55,3 +60,56 @@ def warn_about_missing_s3_environment_variables() -> None:
         "AWS_SECRET_ACCESS_KEY",
         reason="To read/write files from/to S3, AWS credentials must be set in the environment or default credentials will be used.",
     )
+
+
+class _ProducerError:
+    def __init__(self, exception: BaseException) -> None:
+        self.exception = exception
+
+
+def prefetch[T](items: Iterable[T], depth: int) -> Iterator[T]:
+    """
+    Consume an iterable in a background thread, buffering up to `depth` items ahead.
+
+    The background thread blocks when the buffer is full (backpressure), so at most
+    `depth` items are held in memory. Exceptions raised while producing the items are
+    re-raised in the consuming thread.
+
+    Args:
+        items: The iterable to consume in the background thread.
+        depth: The maximum number of buffered items.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item: object) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_END_OF_ITEMS)
+        except BaseException as e:
+            put(_ProducerError(e))
+
+    producer = threading.Thread(target=produce, name="mimicry-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END_OF_ITEMS:
+                return
+            if isinstance(item, _ProducerError):
+                raise item.exception
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
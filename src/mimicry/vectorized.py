@@ -0,0 +1,213 @@
+from collections.abc import Callable
+from datetime import datetime
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+
+# Vectorized generators build a whole column at once with NumPy instead of calling
+# mimesis once per row. They accept the same keyword arguments as the mimesis
+# method they replace, so that `mimesis_field_kwargs` keep their meaning.
+VectorizedGenerator = Callable[..., pl.Series]
+
+VECTORIZED_GENERATORS: dict[str, VectorizedGenerator] = {}
+
+# predicates of the keyword arguments a vectorized generator supports, for the
+# generators that replace only some uses of the mimesis method
+VECTORIZED_CONDITIONS: dict[str, Callable[..., bool]] = {}
+
+_CURRENT_YEAR = datetime.now().year
+
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+# positions of the hex digits within the canonical 36-character UUID string
+_UUID_HEX_POSITIONS = np.array(
+    [idx for idx in range(36) if idx not in (8, 13, 18, 23)],
+)
+
+
+def register(
+    *names: str,
+    applicable: Callable[..., bool] | None = None,
+) -> Callable[[VectorizedGenerator], VectorizedGenerator]:
+    """Register a vectorized generator under the given mimesis field names.
+
+    Args:
+        *names (str): The mimesis field names.
+        applicable (Callable[..., bool] | None): Whether the generator supports the
+            given keyword arguments. If not set, it supports all of its arguments.
+
+    """
+
+    def decorator(func: VectorizedGenerator) -> VectorizedGenerator:
+        for name in names:
+            VECTORIZED_GENERATORS[name] = func
+            if applicable is not None:
+                VECTORIZED_CONDITIONS[name] = applicable
+        return func
+
+    return decorator
+
+
+def get_vectorized_generator(
+    name: str,
+    kwargs: dict | None = None,
+) -> VectorizedGenerator | None:
+    """Get the vectorized generator for a mimesis field name, if there is one.
+
+    Args:
+        name (str): The mimesis field name.
+        kwargs (dict | None): The keyword arguments of the field.
+
+    Returns:
+        VectorizedGenerator | None: The generator, or None if there is none or it
+            does not support the keyword arguments.
+
+    """
+    condition = VECTORIZED_CONDITIONS.get(name)
+    if condition is not None and not condition(**(kwargs or {})):
+        return None
+    return VECTORIZED_GENERATORS.get(name)
+
+
+def sample(rng: np.random.Generator, count: int, values: pl.Series) -> pl.Series:
+    """Sample values uniformly (with replacement) by random index gathering."""
+    return values.gather(rng.integers(0, len(values), size=count))
+
+
+def _uniform(
+    rng: np.random.Generator,
+    count: int,
+    start: float,
+    end: float,
+    precision: int,
+) -> pl.Series:
+    return pl.Series(np.round(rng.uniform(start, end, size=count), precision))
+
+
+def _datetime_range(
+    rng: np.random.Generator,
+    count: int,
+    start: int,
+    end: int,
+    unit: str,
+) -> np.ndarray:
+    lower = np.datetime64(f"{start:04d}-01-01", unit).astype(np.int64)
+    upper = np.datetime64(f"{end + 1:04d}-01-01", unit).astype(np.int64)
+    if lower >= upper:
+        raise ValueError(f"Invalid year range: {start} - {end}.")
+    return rng.integers(lower, upper, size=count).astype(f"datetime64[{unit}]")
+
+
+@register("numeric.integer_number", "integer_number")
+def integer_number(
+    rng: np.random.Generator,
+    count: int,
+    start: int = -1000,
+    end: int = 1000,
+) -> pl.Series:
+    return pl.Series(rng.integers(start, end, size=count, endpoint=True))
+
+
+@register("numeric.float_number", "float_number")
+def float_number(
+    rng: np.random.Generator,
+    count: int,
+    start: float = -1000.0,
+    end: float = 1000.0,
+    precision: int = 15,
+) -> pl.Series:
+    return _uniform(rng, count, start=start, end=end, precision=precision)
+
+
+@register("finance.price", "price")
+def price(
+    rng: np.random.Generator,
+    count: int,
+    minimum: float = 500,
+    maximum: float = 1500,
+) -> pl.Series:
+    return _uniform(rng, count, start=minimum, end=maximum, precision=2)
+
+
+@register("address.latitude", "latitude")
+def latitude(rng: np.random.Generator, count: int) -> pl.Series:
+    return _uniform(rng, count, start=-90, end=90, precision=6)
+
+
+@register("address.longitude", "longitude")
+def longitude(rng: np.random.Generator, count: int) -> pl.Series:
+    return _uniform(rng, count, start=-180, end=180, precision=6)
+
+
+@register("datetime.datetime")
+def datetime_(
+    rng: np.random.Generator,
+    count: int,
+    start: int = _CURRENT_YEAR,
+    end: int = _CURRENT_YEAR,
+) -> pl.Series:
+    return pl.Series(_datetime_range(rng, count, start=start, end=end, unit="us"))
+
+
+@register("datetime.date", "date")
+def date(
+    rng: np.random.Generator,
+    count: int,
+    start: int = 2000,
+    end: int = _CURRENT_YEAR,
+) -> pl.Series:
+    return pl.Series(_datetime_range(rng, count, start=start, end=end, unit="D"))
+
+
+@register("datetime.year", "year")
+def year(
+    rng: np.random.Generator,
+    count: int,
+    minimum: int = 1990,
+    maximum: int = _CURRENT_YEAR,
+) -> pl.Series:
+    return pl.Series(rng.integers(minimum, maximum, size=count, endpoint=True))
+
+
+@register("development.boolean", "boolean")
+def boolean(rng: np.random.Generator, count: int) -> pl.Series:
+    return pl.Series(rng.integers(0, 2, size=count, dtype=np.uint8).astype(bool))
+
+
+@register("cryptographic.uuid", "uuid")
+def uuid(rng: np.random.Generator, count: int) -> pl.Series:
+    raw = rng.integers(0, 256, size=(count, 16), dtype=np.uint8)
+    # set the version (4) and variant (RFC 4122) bits
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+
+    chars = np.full((count, 36), ord("-"), dtype=np.uint8)
+    hex_digits = np.empty((count, 32), dtype=np.uint8)
+    hex_digits[:, 0::2] = _HEX_DIGITS[raw >> 4]
+    hex_digits[:, 1::2] = _HEX_DIGITS[raw & 0x0F]
+    chars[:, _UUID_HEX_POSITIONS] = hex_digits
+
+    offsets = np.arange(0, 36 * (count + 1), 36, dtype=np.int64)
+    array = pa.LargeStringArray.from_buffers(
+        count,
+        pa.py_buffer(offsets),
+        pa.py_buffer(chars),
+    )
+    return pl.Series(array)
+
+
+def _is_single_choice(length: int = 0, unique: bool = False, **kwargs) -> bool:
+    return not length and not unique
+
+
+@register("choice.choice", "choice", applicable=_is_single_choice)
+def choice(
+    rng: np.random.Generator,
+    count: int,
+    items: list,
+    length: int = 0,
+    unique: bool = False,
+) -> pl.Series:
+    # only single item choices are vectorized, see `_is_single_choice`
+    return sample(rng, count, pl.Series(items))
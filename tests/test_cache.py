@@ -0,0 +1,157 @@
+import pathlib
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from mimicry.cache import BatchCache
+from mimicry.data import stream_data
+from mimicry.generator import TableGenerator
+from mimicry.keys import KeyRegistry
+from mimicry.models import FieldConfiguration, SinkConfiguration, TableConfiguration
+
+
+@pytest.fixture
+def seeded_people_table_config(
+    sample_people_table_config: TableConfiguration,
+) -> TableConfiguration:
+    return sample_people_table_config.model_copy(update={"seed": 42})
+
+
+@pytest.mark.unit
+def test_table_generator_reads_cached_batches(
+    seeded_people_table_config: TableConfiguration,
+    tmp_path: pathlib.Path,
+) -> None:
+    cache = BatchCache(tmp_path)
+    generated = TableGenerator(
+        table=seeded_people_table_config, strict=True, shard_size=40, cache=cache
+    ).generate(count=100)
+
+    generator = TableGenerator(
+        table=seeded_people_table_config, strict=True, shard_size=40, cache=cache
+    )
+    generator._generate_shards = None  # cached batches must not be generated
+    cached = generator.generate(count=100)
+
+    assert_frame_equal(cached, generated)
+    assert [len(shard) for shard in generator.iter_shards(100, batch_idx=0)] == [
+        40,
+        40,
+        20,
+    ]
+    assert cache.count_batches(seeded_people_table_config, 100, 40, first_idx=0) == 1
+
+
+@pytest.mark.unit
+def test_batch_cache_discards_partially_written_batches(
+    seeded_people_table_config: TableConfiguration,
+    tmp_path: pathlib.Path,
+) -> None:
+    cache = BatchCache(tmp_path)
+    generator = TableGenerator(
+        table=seeded_people_table_config, strict=True, shard_size=40, cache=cache
+    )
+
+    shards = generator.iter_shards(count=100)
+    next(shards)
+    shards.close()
+
+    assert list(tmp_path.iterdir()) == []
+    with pytest.raises(ValueError):
+        cache.key(seeded_people_table_config.model_copy(update={"seed": None}), 1, 0, 1)
+
+
+@pytest.mark.unit
+def test_batch_cache_publishes_the_same_keys_as_generated_batches(
+    seeded_people_table_config: TableConfiguration,
+    tmp_path: pathlib.Path,
+) -> None:
+    fields = [
+        field.model_copy(update={"null_rate": 0.5}) if field.name == "id" else field
+        for field in seeded_people_table_config.fields
+    ]
+    table = seeded_people_table_config.model_copy(update={"fields": fields})
+    cache = BatchCache(tmp_path)
+
+    batches, keys = [], []
+    for _ in range(2):  # generated, then read from the cache
+        registry = KeyRegistry()
+        index = registry.expect(f"{table.name}.id")
+        generator = TableGenerator(
+            table=table, strict=True, cache=cache, registry=registry
+        )
+        batches.append(generator.generate(count=100))
+        keys.append(index.keys)
+
+    assert len(list(tmp_path.iterdir())) == 1
+    assert_frame_equal(batches[1], batches[0])
+    assert batches[0]["id"].null_count() > 0
+    assert keys[1].equals(keys[0])
+    assert keys[0].null_count() == 0
+
+
+@pytest.mark.unit
+def test_table_generator_does_not_cache_tables_with_references(
+    seeded_people_table_config: TableConfiguration,
+    tmp_path: pathlib.Path,
+) -> None:
+    table = seeded_people_table_config.model_copy(
+        update={
+            "fields": [
+                *seeded_people_table_config.fields,
+                FieldConfiguration(
+                    name="manager_id",
+                    description="Foreign key of the manager.",
+                    references="managers.id",
+                ),
+            ]
+        }
+    )
+
+    generator = TableGenerator(
+        table=table, strict=True, cache=BatchCache(tmp_path), registry=KeyRegistry()
+    )
+
+    assert generator.cache is None
+
+
+@pytest.mark.unit
+def test_stream_data_replays_cached_batches(
+    seeded_people_table_config: TableConfiguration,
+    sample_people_deltalake_sink_config: SinkConfiguration,
+    tmp_path: pathlib.Path,
+) -> None:
+    cache = BatchCache(tmp_path / "cache")
+    with pytest.raises(ValueError):
+        stream_data(
+            table=seeded_people_table_config,
+            count=50,
+            interval=0,
+            num_of_batches=1,
+            sink=sample_people_deltalake_sink_config,
+            cache=cache,
+            replay=True,
+        )
+
+    stream_data(
+        table=seeded_people_table_config,
+        count=50,
+        interval=0,
+        num_of_batches=2,
+        sink=sample_people_deltalake_sink_config,
+        cache=cache,
+    )
+    stream_data(
+        table=seeded_people_table_config,
+        count=50,
+        interval=0,
+        num_of_batches=4,
+        sink=sample_people_deltalake_sink_config,
+        cache=cache,
+        replay=True,
+    )
+
+    df = pl.read_delta(sample_people_deltalake_sink_config.configuration.path)
+    assert df.height == 300
+    assert df.n_unique() == 100
@@ -1,10 +1,10 @@
-import os
 import duckdb
 import polars as pl
 import pytest
 import json
+import threading
 
-from mimicry.data import generate_data, stream_data
+from mimicry.data import generate_data, iter_batches, stream_data
 from mimicry.exceptions import MimicryInvalidCountValueError
 from mimicry.models import SinkConfiguration, TableConfiguration
 from kafka import KafkaConsumer
@@ -78,7 +78,6 @@ def test_stream_duckdb_data_works_as_expected(
     sample_people_table_config: TableConfiguration,
     sample_people_duckdb_sink_config: SinkConfiguration,
 ) -> None:
-    os.environ["MIMICRY_UNSAFE_DUCKDB"] = "TRUE"
 
     stream_data(
         table=sample_people_table_config,
@@ -193,3 +192,137 @@ def test_append_to_iceberg(
     table = catalog.load_table("test.people")
 
     is_sample_people_df_valid(table.to_polars().collect(), count=100)
+
+
+@pytest.mark.unit
+def test_generate_data_with_workers_works_as_expected(
+    sample_people_table_config: TableConfiguration,
+) -> None:
+    df = generate_data(
+        table=sample_people_table_config, count=100, strict=True, workers=2
+    )
+    is_sample_people_df_valid(df)
+
+
+@pytest.mark.unit
+def test_stream_delta_lake_data_with_categorical_fields_works_as_expected(
+    sample_people_table_config: TableConfiguration,
+    sample_people_deltalake_sink_config: SinkConfiguration,
+) -> None:
+    table = sample_people_table_config.model_copy(
+        update={
+            "fields": [
+                field.model_copy(update={"categorical": field.name == "first_name"})
+                for field in sample_people_table_config.fields
+            ]
+        }
+    )
+
+    stream_data(
+        table=table,
+        count=100,
+        strict=True,
+        num_of_batches=1,
+        interval=1,
+        sink=sample_people_deltalake_sink_config,
+    )
+    df = pl.read_delta(
+        sample_people_deltalake_sink_config.configuration.path,
+    )
+    is_sample_people_df_valid(df)
+
+
+@pytest.mark.unit
+def test_iter_batches_works_as_expected(
+    sample_people_table_config: TableConfiguration,
+) -> None:
+    chunks = list(
+        iter_batches(table=sample_people_table_config, total_rows=250, chunk_rows=100)
+    )
+
+    assert [get_dataframe_size(chunk) for chunk in chunks] == [100, 100, 50]
+    is_sample_people_df_valid(pl.concat(chunks), count=250)
+
+
+@pytest.mark.unit
+def test_stream_delta_lake_data_in_chunks_works_as_expected(
+    sample_people_table_config: TableConfiguration,
+    sample_people_deltalake_sink_config: SinkConfiguration,
+) -> None:
+    stream_data(
+        table=sample_people_table_config,
+        count=100,
+        strict=True,
+        num_of_batches=1,
+        interval=1,
+        sink=sample_people_deltalake_sink_config,
+        chunk_rows=30,
+    )
+    df = pl.read_delta(
+        sample_people_deltalake_sink_config.configuration.path,
+    )
+    is_sample_people_df_valid(df)
+
+
+@pytest.mark.unit
+def test_stream_data_warns_about_workers_left_idle_by_single_shard_batches(
+    sample_people_table_config: TableConfiguration,
+    sample_people_deltalake_sink_config: SinkConfiguration,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    stream_data(
+        table=sample_people_table_config,
+        count=100,
+        strict=True,
+        num_of_batches=1,
+        interval=0,
+        sink=sample_people_deltalake_sink_config,
+        workers=2,
+    )
+
+    assert "generated by 1 of the 2 workers" in caplog.text
+
+
+@pytest.mark.unit
+def test_stream_data_reports_the_records_appended_before_it_is_stopped(
+    sample_people_table_config: TableConfiguration,
+    sample_people_deltalake_sink_config: SinkConfiguration,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    stop = threading.Event()
+    stop.set()
+    with caplog.at_level("INFO"):
+        stream_data(
+            table=sample_people_table_config,
+            count=100,
+            strict=True,
+            num_of_batches=3,
+            interval=0,
+            sink=sample_people_deltalake_sink_config,
+            stop=stop,
+        )
+
+    assert "Streaming completed. Appended 100 records" in caplog.text
+    df = pl.read_delta(sample_people_deltalake_sink_config.configuration.path)
+    assert df.height == 100
+
+
+@pytest.mark.unit
+def test_stream_delta_lake_data_pipelined_works_as_expected(
+    sample_people_table_config: TableConfiguration,
+    sample_people_deltalake_sink_config: SinkConfiguration,
+) -> None:
+    stream_data(
+        table=sample_people_table_config,
+        count=50,
+        strict=True,
+        num_of_batches=3,
+        interval=0,
+        sink=sample_people_deltalake_sink_config,
+        chunk_rows=20,
+        queue_depth=2,
+    )
+    df = pl.read_delta(
+        sample_people_deltalake_sink_config.configuration.path,
+    )
+    is_sample_people_df_valid(df, count=150)
@@ -0,0 +1,39 @@
+import polars as pl
+import pydantic
+import pytest
+
+from mimicry.dtypes import parse_dtype
+from mimicry.models import FieldConfiguration
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("Int16", pl.Int16()),
+        ("Float32", pl.Float32()),
+        ("Date", pl.Date()),
+        ('Datetime("ms")', pl.Datetime("ms")),
+        ("Datetime('us', 'UTC')", pl.Datetime("us", "UTC")),
+    ],
+)
+def test_parse_dtype_works_as_expected(value: str, expected: pl.DataType) -> None:
+    assert parse_dtype(value) == expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("value", ["Int17", "int16", "Datetime(ms)", "os.system"])
+def test_parse_dtype_with_invalid_value_raises_error(value: str) -> None:
+    with pytest.raises(ValueError):
+        parse_dtype(value)
+
+
+@pytest.mark.unit
+def test_field_configuration_with_invalid_dtype_raises_error() -> None:
+    with pytest.raises(pydantic.ValidationError):
+        FieldConfiguration(
+            name="id",
+            description="Identifier.",
+            mimesis_field_name="numeric.integer_number",
+            dtype="Int17",
+        )
@@ -0,0 +1,356 @@
+import pathlib
+
+import polars as pl
+import pydantic
+import pytest
+
+from mimicry.core import load_table_config
+from mimicry.exceptions import (
+    MimicryInvalidCountValueError,
+    MimicryInvalidFieldConfigurationError,
+    MimicryInvalidWorkersValueError,
+)
+from mimicry.generator import TableGenerator, split_count
+from mimicry.models import FieldConfiguration, TableConfiguration
+
+EXAMPLES_PATH = pathlib.Path(__file__).parent.parent / "examples"
+
+
+@pytest.fixture
+def invalid_field_table_config(
+    sample_people_table_config: TableConfiguration,
+) -> TableConfiguration:
+    return sample_people_table_config.model_copy(
+        update={
+            "fields": [
+                *sample_people_table_config.fields,
+                FieldConfiguration(
+                    name="invalid",
+                    description="Field using a non-existent provider.",
+                    mimesis_field_name="not_a_provider.not_a_method",
+                ),
+            ]
+        }
+    )
+
+
+@pytest.mark.unit
+def test_table_generator_can_be_reused_across_batches(
+    sample_people_table_config: TableConfiguration,
+) -> None:
+    generator = TableGenerator(table=sample_people_table_config, strict=True)
+
+    first = generator.generate(count=10)
+    second = generator.generate(count=20)
+
+    assert first.height == 10
+    assert second.height == 20
+    assert first.schema == second.schema
+
+
+@pytest.mark.unit
+def test_table_generator_skips_invalid_fields_when_not_strict(
+    invalid_field_table_config: TableConfiguration,
+) -> None:
+    generator = TableGenerator(table=invalid_field_table_config, strict=False)
+
+    df = generator.generate(count=5)
+
+    assert "invalid" not in df.columns
+    assert df.columns == ["id", "first_name", "last_name", "birth_date"]
+
+
+@pytest.mark.unit
+def test_table_generator_raises_on_invalid_fields_when_strict(
+    invalid_field_table_config: TableConfiguration,
+) -> None:
+    with pytest.raises(MimicryInvalidFieldConfigurationError):
+        TableGenerator(table=invalid_field_table_config, strict=True)
+
+
+@pytest.mark.unit
+def test_table_generator_with_invalid_count_raises_error(
+    sample_people_table_config: TableConfiguration,
+) -> None:
+    generator = TableGenerator(table=sample_people_table_config, strict=True)
+
+    with pytest.raises(MimicryInvalidCountValueError):
+        generator.generate(count=0)
+
+
+@pytest.mark.unit
+def test_split_count_works_as_expected() -> None:
+    assert split_count(10, 4) == [4, 4, 2]
+    assert split_count(8, 4) == [4, 4]
+    assert split_count(2, 4) == [2]
+
+
+@pytest.mark.unit
+def test_table_generator_with_workers_generates_whole_batch(
+    sample_people_table_config: TableConfiguration,
+) -> None:
+    with TableGenerator(
+        table=sample_people_table_config, strict=True, workers=2, shard_size=50
+    ) as generator:
+        df = generator.generate(count=101)
+
+    assert df.height == 101
+    assert df.columns == ["id", "first_name", "last_name", "birth_date"]
+    # each shard is generated with its own seed
+    assert not df.head(50).equals(df.slice(51, 50))
+
+
+@pytest.mark.unit
+def test_table_generator_with_invalid_workers_raises_error(
+    sample_people_table_config: TableConfiguration,
+) -> None:
+    with pytest.raises(MimicryInvalidWorkersValueError):
+        TableGenerator(table=sample_people_table_config, strict=True, workers=0)
+
+
+@pytest.mark.unit
+def test_table_generator_builds_enum_columns_for_categorical_fields() -> None:
+    table = TableConfiguration(
+        name="orders",
+        description="Orders with low-cardinality fields.",
+        fields=[
+            FieldConfiguration(
+                name="status",
+                description="Order status.",
+                mimesis_field_name="choice.choice",
+                mimesis_field_kwargs={"items": ["Pending", "Shipped"]},
+                categorical=True,
+            ),
+            FieldConfiguration(
+                name="network",
+                description="Credit card network.",
+                mimesis_field_name="payment.credit_card_network",
+                categorical=True,
+            ),
+        ],
+    )
+
+    with TableGenerator(
+        table=table, strict=True, workers=2, shard_size=50
+    ) as generator:
+        df = generator.generate(count=100)
+
+    assert df.schema["status"] == pl.Enum(["Pending", "Shipped"])
+    assert isinstance(df.schema["network"], pl.Enum)
+    assert set(df["network"].unique()) <= set(generator.pools["network"])
+
+
+@pytest.mark.unit
+def test_table_generator_rejects_categorical_non_string_fields(
+    sample_people_table_config: TableConfiguration,
+) -> None:
+    table = sample_people_table_config.model_copy(
+        update={
+            "fields": [
+                sample_people_table_config.fields[0].model_copy(
+                    update={"categorical": True}
+                )
+            ]
+        }
+    )
+
+    with pytest.raises(MimicryInvalidFieldConfigurationError):
+        TableGenerator(table=table, strict=True)
+
+
+@pytest.mark.unit
+def test_table_generator_builds_columns_with_declared_dtypes(
+    sample_people_table_config: TableConfiguration,
+) -> None:
+    dtypes = {"id": "Int16", "birth_date": 'Datetime("ms")', "first_name": "String"}
+    table = sample_people_table_config.model_copy(
+        update={
+            "fields": [
+                field.model_copy(update={"dtype": dtypes.get(field.name)})
+                for field in sample_people_table_config.fields
+            ]
+        }
+    )
+    generator = TableGenerator(table=table, strict=True)
+
+    df = generator.generate(count=10)
+
+    expected_schema = pl.Schema(
+        {
+            "id": pl.Int16,
+            "first_name": pl.String,
+            "last_name": pl.String,
+            "birth_date": pl.Datetime("ms"),
+        }
+    )
+    assert df.schema == expected_schema
+    assert generator.schema == expected_schema
+
+
+@pytest.mark.unit
+def test_seeded_table_generator_is_reproducible_regardless_of_workers(
+    sample_people_table_config: TableConfiguration,
+) -> None:
+    table = sample_people_table_config.model_copy(update={"seed": 42})
+
+    with TableGenerator(table=table, strict=True, shard_size=40) as generator:
+        first_batch = generator.generate(count=100, batch_idx=1)
+        second_batch = generator.generate(count=100, batch_idx=2)
+
+    with TableGenerator(
+        table=table, strict=True, workers=2, shard_size=40
+    ) as generator:
+        parallel_first_batch = generator.generate(count=100, batch_idx=1)
+
+    assert first_batch.equals(parallel_first_batch)
+    assert not first_batch.equals(second_batch)
+
+
+@pytest.mark.unit
+def test_table_generator_evaluates_expression_fields() -> None:
+    table = TableConfiguration(
+        name="orders",
+        description="Orders with a derived total.",
+        fields=[
+            FieldConfiguration(
+                name="total",
+                description="Quantity times price.",
+                expression="quantity * price",
+                dtype="Float32",
+            ),
+            FieldConfiguration(
+                name="quantity",
+                description="Quantity.",
+                mimesis_field_name="numeric.integer_number",
+                mimesis_field_kwargs={"start": 1, "end": 10},
+            ),
+            FieldConfiguration(
+                name="price",
+                description="Price.",
+                mimesis_field_name="finance.price",
+            ),
+            FieldConfiguration(
+                name="invalid",
+                description="Expression over a non-existent column.",
+                expression="quantity * missing",
+            ),
+        ],
+    )
+
+    with TableGenerator(
+        table=table, strict=False, workers=2, shard_size=50
+    ) as generator:
+        df = generator.generate(count=100)
+
+    assert df.columns == ["total", "quantity", "price"]
+    assert generator.schema == df.schema
+    assert df.schema["total"] == pl.Float32
+    assert (df["total"] == (df["quantity"] * df["price"]).cast(pl.Float32)).all()
+
+    with pytest.raises(MimicryInvalidFieldConfigurationError):
+        TableGenerator(table=table, strict=True)
+
+
+@pytest.mark.unit
+def test_table_generator_injects_nulls_outliers_and_duplicates() -> None:
+    table = TableConfiguration(
+        name="dirty",
+        description="Table with dirty data.",
+        seed=7,
+        duplicate_rate=0.2,
+        fields=[
+            FieldConfiguration(
+                name="id",
+                description="Unique identifier.",
+                mimesis_field_name="cryptographic.uuid",
+                null_rate=0.1,
+            ),
+            FieldConfiguration(
+                name="amount",
+                description="Amount between 1 and 10.",
+                mimesis_field_name="numeric.integer_number",
+                mimesis_field_kwargs={"start": 1, "end": 10},
+                dtype="Int32",
+                outlier_rate=0.1,
+            ),
+        ],
+    )
+
+    df = TableGenerator(table=table, strict=True).generate(count=10_000)
+
+    assert df.schema == pl.Schema({"id": pl.String, "amount": pl.Int32})
+    assert 700 < df["id"].null_count() < 1300
+    assert 700 < (df["amount"] >= 100).sum() < 1300
+    assert 1700 < df.filter(pl.col("id").is_not_null()).is_duplicated().sum()
+
+
+@pytest.mark.unit
+def test_table_generator_clamps_outliers_to_the_range_of_the_dtype() -> None:
+    table = TableConfiguration(
+        name="dirty",
+        description="Table with outliers overflowing their type.",
+        seed=7,
+        fields=[
+            FieldConfiguration(
+                name="amount",
+                description="Amount between 100 and 1000.",
+                mimesis_field_name="numeric.integer_number",
+                mimesis_field_kwargs={"start": 100, "end": 1000},
+                dtype="Int16",
+                outlier_rate=0.5,
+            ),
+        ],
+    )
+
+    df = TableGenerator(table=table, strict=True).generate(count=1000)
+
+    assert df["amount"].null_count() == 0
+    assert 300 < (df["amount"] == 32767).sum() < 700
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("outlier_scale", [0, 1, -2])
+def test_field_configuration_rejects_outlier_scales_keeping_values(
+    outlier_scale: float,
+) -> None:
+    with pytest.raises(pydantic.ValidationError):
+        FieldConfiguration(
+            name="amount",
+            description="Amount.",
+            mimesis_field_name="numeric.integer_number",
+            outlier_rate=0.1,
+            outlier_scale=outlier_scale,
+        )
+
+
+@pytest.mark.unit
+def test_table_generator_rejects_outliers_for_non_numeric_fields() -> None:
+    table = TableConfiguration(
+        name="dirty",
+        description="Table with dirty data.",
+        fields=[
+            FieldConfiguration(
+                name="name",
+                description="Full name.",
+                mimesis_field_name="person.full_name",
+                outlier_rate=0.1,
+            ),
+        ],
+    )
+
+    with pytest.raises(MimicryInvalidFieldConfigurationError):
+        TableGenerator(table=table, strict=True)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "path",
+    sorted((EXAMPLES_PATH / "tables").glob("*.yaml")),
+    ids=lambda path: path.stem,
+)
+def test_example_tables_are_generated_on_their_own(path: pathlib.Path) -> None:
+    table = load_table_config(path)
+
+    df = TableGenerator(table=table, strict=True).generate(count=10)
+
+    assert df.columns == [field.name for field in table.fields]
@@ -0,0 +1,103 @@
+import _thread
+import pathlib
+import threading
+
+import polars as pl
+import pytest
+import yaml
+
+from mimicry.jobs import run_job
+from mimicry.models import JobConfiguration, StreamConfiguration
+
+from tests.conftest import STATIC_PATH
+
+
+def write_delta_sink_config(path: pathlib.Path, table_path: pathlib.Path) -> str:
+    path.write_text(
+        yaml.safe_dump(
+            {"configuration": {"type_of_sink": "delta_lake", "path": str(table_path)}}
+        )
+    )
+    return str(path)
+
+
+@pytest.mark.unit
+def test_run_job_streams_multiple_tables_concurrently(tmp_path: pathlib.Path) -> None:
+    job = JobConfiguration(
+        workers=2,
+        streams=[
+            StreamConfiguration(
+                table=str(STATIC_PATH / "people.yaml"),
+                sink=write_delta_sink_config(
+                    tmp_path / f"sink_{idx}.yaml", tmp_path / f"people_{idx}"
+                ),
+                count=count,
+                batches=2,
+                interval=0,
+                chunk_rows=50,
+            )
+            for idx, count in enumerate([100, 150])
+        ],
+    )
+
+    run_job(job=job, strict=True)
+
+    assert pl.read_delta(str(tmp_path / "people_0")).height == 200
+    assert pl.read_delta(str(tmp_path / "people_1")).height == 300
+
+
+@pytest.mark.unit
+def test_run_job_stops_infinite_streams_when_interrupted(
+    tmp_path: pathlib.Path,
+) -> None:
+    sink_path = tmp_path / "sink.yaml"
+    sink_path.write_text(
+        yaml.safe_dump(
+            {
+                "configuration": {
+                    "type_of_sink": "delta_lake",
+                    "path": str(tmp_path / "people"),
+                },
+                # the buffered batches are only written when the sink is closed
+                "buffer": {"max_rows": 1_000_000},
+            }
+        )
+    )
+    job = JobConfiguration(
+        streams=[
+            StreamConfiguration(
+                table=str(STATIC_PATH / "people.yaml"),
+                sink=str(sink_path),
+                count=10,
+                batches=-1,
+                interval=0.05,
+            )
+        ],
+    )
+
+    timer = threading.Timer(1.0, _thread.interrupt_main)
+    timer.start()
+    with pytest.raises(KeyboardInterrupt):
+        run_job(job=job, strict=True)
+    timer.join()
+
+    assert not any(
+        thread.name.startswith("mimicry-stream") for thread in threading.enumerate()
+    )
+    assert pl.read_delta(str(tmp_path / "people")).height >= 10
+
+
+@pytest.mark.unit
+def test_stream_configuration_requires_interval_or_rate() -> None:
+    with pytest.raises(ValueError):
+        StreamConfiguration(table="table.yaml", sink="sink.yaml", count=1, batches=1)
+
+    with pytest.raises(ValueError):
+        StreamConfiguration(
+            table="table.yaml",
+            sink="sink.yaml",
+            count=1,
+            batches=1,
+            interval=1,
+            rows_per_second=10,
+        )
@@ -0,0 +1,168 @@
+import numpy as np
+import polars as pl
+import pytest
+
+from mimicry.exceptions import MimicryInvalidFieldConfigurationError
+from mimicry.generator import TableGenerator
+from mimicry.jobs import build_key_registry
+from mimicry.keys import KeyIndex, KeyRegistry, parse_reference
+from mimicry.models import FieldConfiguration, TableConfiguration
+
+
+@pytest.fixture
+def users_table_config() -> TableConfiguration:
+    return TableConfiguration(
+        name="Users",
+        description="Users with integer keys.",
+        seed=1,
+        fields=[
+            FieldConfiguration(
+                name="user_id",
+                description="Primary key.",
+                mimesis_field_name="numeric.integer_number",
+                mimesis_field_kwargs={"start": 0, "end": 1_000_000},
+            ),
+        ],
+    )
+
+
+@pytest.fixture
+def orders_table_config() -> TableConfiguration:
+    return TableConfiguration(
+        name="Orders",
+        description="Orders referencing the users.",
+        seed=2,
+        fields=[
+            FieldConfiguration(
+                name="quantity",
+                description="Quantity.",
+                mimesis_field_name="numeric.integer_number",
+                mimesis_field_kwargs={"start": 1, "end": 10},
+            ),
+            FieldConfiguration(
+                name="user_id_fk",
+                description="Foreign key of the user.",
+                references="Users.user_id",
+                reference_skew=1.0,
+            ),
+        ],
+    )
+
+
+@pytest.mark.unit
+def test_parse_reference_works_as_expected() -> None:
+    assert parse_reference("DimUsers.user_id") == ("DimUsers", "user_id")
+
+    with pytest.raises(ValueError):
+        parse_reference("user_id")
+
+
+@pytest.mark.unit
+def test_key_index_samples_published_keys_with_skew() -> None:
+    index = KeyIndex()
+    index.publish(pl.Series(range(50)))
+    index.publish(pl.Series(range(50, 100)))
+    rng = np.random.default_rng(42)
+
+    uniform = index.sample(rng, 10_000)
+    skewed = index.sample(rng, 10_000, skew=1.5)
+
+    assert len(index) == 100
+    assert uniform.is_between(0, 99).all()
+    assert skewed.is_between(0, 99).all()
+    assert (skewed == 0).sum() > 3 * (uniform == 0).sum()
+
+
+@pytest.mark.unit
+def test_key_index_keeps_a_uniform_sample_of_at_most_max_keys() -> None:
+    index = KeyIndex(max_keys=1_000)
+    for offset in range(0, 100_000, 500):
+        index.publish(pl.Series(range(offset, offset + 500)))
+
+    keys = index.keys
+    skewed = index.sample(np.random.default_rng(42), 1_000, skew=1.0)
+
+    assert len(index) == 1_000
+    assert keys.n_unique() == 1_000
+    assert keys.is_between(0, 99_999).all()
+    # the later keys are as likely to be kept as the first ones
+    assert 40_000 < keys.mean() < 60_000
+    assert skewed.is_in(keys).all()
+
+
+@pytest.mark.unit
+def test_key_index_keeps_few_segments() -> None:
+    index = KeyIndex(max_keys=None)
+    for offset in range(0, 10_000, 10):
+        index.publish(pl.Series(range(offset, offset + 10)))
+
+    assert len(index) == 10_000
+    assert len(index._segments) <= 10
+    assert index.keys.to_list() == list(range(10_000))
+
+
+@pytest.mark.unit
+def test_key_registry_raises_if_keys_are_not_published() -> None:
+    registry = KeyRegistry(timeout=0)
+
+    with pytest.raises(ValueError):
+        registry.sample("Users.user_id", np.random.default_rng(), 10)
+
+
+@pytest.mark.unit
+def test_table_generator_draws_foreign_keys_from_referenced_table(
+    users_table_config: TableConfiguration,
+    orders_table_config: TableConfiguration,
+) -> None:
+    registry = KeyRegistry(timeout=0)
+    orders_generator = TableGenerator(
+        table=orders_table_config,
+        strict=True,
+        workers=2,
+        shard_size=50,
+        registry=registry,
+    )
+    users_generator = TableGenerator(
+        table=users_table_config, strict=True, registry=registry
+    )
+
+    with orders_generator:
+        users = users_generator.generate(count=100)
+        orders = orders_generator.generate(count=200)
+
+    assert orders.columns == ["quantity", "user_id_fk"]
+    assert orders.schema["user_id_fk"] == pl.Int64
+    assert orders["user_id_fk"].is_in(users["user_id"]).all()
+
+
+@pytest.mark.unit
+def test_table_generator_rejects_references_without_registry(
+    orders_table_config: TableConfiguration,
+) -> None:
+    with pytest.raises(MimicryInvalidFieldConfigurationError):
+        TableGenerator(table=orders_table_config, strict=True)
+
+    generator = TableGenerator(table=orders_table_config, strict=False)
+    assert generator.generate(count=10).columns == ["quantity"]
+
+
+@pytest.mark.unit
+def test_build_key_registry_rejects_references_outside_of_job(
+    orders_table_config: TableConfiguration,
+) -> None:
+    with pytest.raises(ValueError):
+        build_key_registry([orders_table_config])
+
+
+@pytest.mark.unit
+def test_field_configuration_requires_provider_or_reference() -> None:
+    with pytest.raises(ValueError):
+        FieldConfiguration(name="user_id_fk", description="Foreign key.")
+
+    with pytest.raises(ValueError):
+        FieldConfiguration(
+            name="user_id_fk",
+            description="Foreign key.",
+            mimesis_field_name="cryptographic.uuid",
+            references="Users.user_id",
+        )
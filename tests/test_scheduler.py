@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from mimicry.scheduler import RateScheduler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.mark.unit
+def test_rate_scheduler_compensates_for_time_spent_on_batches() -> None:
+    clock = FakeClock()
+    scheduler = RateScheduler(interval=1.0, clock=clock, sleep=clock.sleep)
+
+    clock.now += 0.4  # batch 1 takes 0.4 seconds
+    scheduler.wait()
+    assert clock.now == pytest.approx(1.0)
+
+    clock.now += 0.7  # batch 2 takes 0.7 seconds
+    scheduler.wait()
+    assert clock.now == pytest.approx(2.0)
+    assert scheduler.dropped_ticks == 0
+
+
+@pytest.mark.unit
+def test_rate_scheduler_drops_missed_ticks_and_reports_lag() -> None:
+    clock = FakeClock()
+    scheduler = RateScheduler(interval=0.5, clock=clock, sleep=clock.sleep)
+
+    clock.now += 1.7  # batch 1 takes more than three intervals
+    scheduler.wait()
+
+    assert clock.now == pytest.approx(1.7)
+    assert scheduler.lag == pytest.approx(1.2)
+    assert scheduler.dropped_ticks == 2
+
+    clock.now += 0.1
+    scheduler.wait()
+    assert clock.now == pytest.approx(2.0)
+
+
+@pytest.mark.unit
+def test_rate_scheduler_with_negative_interval_raises_error() -> None:
+    with pytest.raises(ValueError):
+        RateScheduler(interval=-1)
+
+
+@pytest.mark.unit
+def test_rate_scheduler_stops_waiting_when_stopped() -> None:
+    stop = threading.Event()
+    scheduler = RateScheduler(interval=60.0)
+
+    stop.set()
+
+    assert scheduler.wait(stop) is False
@@ -1,5 +1,9 @@
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+
 from fastapi.testclient import TestClient
 
+from mimicry.cache import BatchCache
 from mimicry.models import TableConfiguration
 from mimicry.server import build_fastapi_app
 
@@ -23,3 +27,100 @@ def test_simple_server_works_as_expected(
     assert isinstance(response.json(), list)
     assert len(response.json()) == 10
     assert all([list(item.keys()) == expected_field_names for item in response.json()])
+
+
+def test_server_returns_nulls_of_fields_with_null_rate(
+    sample_people_table_config: TableConfiguration,
+) -> None:
+    fields = [
+        field.model_copy(update={"null_rate": 0.3}) if field.name == "id" else field
+        for field in sample_people_table_config.fields
+    ]
+    table = sample_people_table_config.model_copy(update={"fields": fields})
+    app = build_fastapi_app(
+        table,
+        strict=True,
+        name=f"API for {table.name}",
+        description="Test API",
+        max_count=100,
+    )
+    client = TestClient(app)
+    response = client.get(f"/tables/{table.name}", params={"count": 100})
+
+    assert response.status_code == 200
+    assert any(item["id"] is None for item in response.json())
+    assert all(item["first_name"] is not None for item in response.json())
+
+
+def test_server_returns_outliers_overflowing_the_dtype(
+    sample_people_table_config: TableConfiguration,
+) -> None:
+    fields = [
+        field.model_copy(update={"dtype": "Int16", "outlier_rate": 0.5})
+        if field.name == "id"
+        else field
+        for field in sample_people_table_config.fields
+    ]
+    table = sample_people_table_config.model_copy(update={"fields": fields})
+    app = build_fastapi_app(
+        table,
+        strict=True,
+        name=f"API for {table.name}",
+        description="Test API",
+        max_count=100,
+    )
+    client = TestClient(app)
+    response = client.get(f"/tables/{table.name}", params={"count": 100})
+
+    assert response.status_code == 200
+    assert all(item["id"] is not None for item in response.json())
+
+
+def test_server_serves_seeded_tables_from_the_cache(
+    sample_people_table_config: TableConfiguration,
+    tmp_path: pathlib.Path,
+) -> None:
+    table = sample_people_table_config.model_copy(update={"seed": 42})
+    app = build_fastapi_app(
+        table,
+        strict=True,
+        name=f"API for {table.name}",
+        description="Test API",
+        max_count=10,
+        cache=BatchCache(tmp_path),
+    )
+    client = TestClient(app)
+    responses = [
+        client.get(f"/tables/{table.name}", params={"count": 10}).json()
+        for _ in range(3)
+    ]
+
+    assert responses[1] == responses[0]
+    assert responses[2] == responses[0]
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_server_generates_concurrent_requests_of_seeded_tables_consistently(
+    sample_people_table_config: TableConfiguration,
+    tmp_path: pathlib.Path,
+) -> None:
+    table = sample_people_table_config.model_copy(update={"seed": 42})
+    app = build_fastapi_app(
+        table,
+        strict=True,
+        name=f"API for {table.name}",
+        description="Test API",
+        max_count=2000,
+        cache=BatchCache(tmp_path),
+    )
+    client = TestClient(app)
+
+    def get() -> list[dict]:
+        return client.get(f"/tables/{table.name}", params={"count": 2000}).json()
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        responses = list(executor.map(lambda _: get(), range(32)))
+    expected = get()
+
+    assert len(expected) == 2000
+    assert all(response == expected for response in responses)
@@ -0,0 +1,675 @@
+import inspect
+import io
+import json
+
+import duckdb
+import polars as pl
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.json as pajson
+import pyarrow.parquet as pq
+import pytest
+from deltalake import DeltaTable
+from pyiceberg.catalog import Catalog, load_catalog
+from pyiceberg.io.pyarrow import _dataframe_to_data_files
+from pyiceberg.schema import Schema as IcebergSchema
+from pyiceberg.schema import assign_fresh_schema_ids
+from pyiceberg.table.sorting import SortDirection
+from pyiceberg.table.update import RemoveSnapshotsUpdate
+
+from mimicry.models import (
+    SinkBufferConfiguration,
+    SinkConfiguration,
+    SinkSpoolConfiguration,
+)
+from mimicry.sinks import (
+    Batch,
+    SinkSession,
+    SpoolingSinkSession,
+    duckdb_identifier,
+    open_sink_session,
+    postgres_column_type,
+    sink_batch_representations,
+)
+
+
+@pytest.fixture
+def sample_data() -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "id": [1, 2],
+            "status": pl.Series(["new", "done"], dtype=pl.Enum(["new", "done"])),
+        }
+    )
+
+
+@pytest.mark.unit
+def test_batch_converts_data_once_for_sinks(sample_data: pl.DataFrame) -> None:
+    batch = Batch(data=sample_data, idx=1)
+
+    assert batch.arrow is batch.arrow
+    assert pa.types.is_dictionary(batch.arrow.schema.field("status").type)
+    assert batch.arrow.column("status").to_pylist() == ["new", "done"]
+    assert batch.frame.schema["status"] == pl.String
+    assert [json.loads(record) for record in batch.records] == [
+        json.loads(line) for line in sample_data.write_ndjson().splitlines()
+    ]
+
+
+@pytest.mark.unit
+def test_duckdb_sink_session_reuses_connection_across_batches(
+    sample_data: pl.DataFrame,
+    sample_people_duckdb_sink_config: SinkConfiguration,
+) -> None:
+    with open_sink_session(sample_people_duckdb_sink_config) as session:
+        conn = session.conn
+        for idx in range(1, 4):
+            session.write(Batch(data=sample_data, idx=idx))
+            assert session.conn is conn
+    assert session.conn is None
+
+    with duckdb.connect(sample_people_duckdb_sink_config.configuration.path) as conn:
+        assert conn.table("people").pl().height == 6
+
+
+@pytest.mark.unit
+def test_duckdb_sink_session_quotes_table_name(
+    sample_data: pl.DataFrame,
+    sample_people_duckdb_sink_config: SinkConfiguration,
+) -> None:
+    table_name = 'main.people"; DROP TABLE people; --'
+    sink = sample_people_duckdb_sink_config.model_copy(
+        update={
+            "configuration": sample_people_duckdb_sink_config.configuration.model_copy(
+                update={"table_name": table_name}
+            )
+        }
+    )
+
+    with open_sink_session(sink) as session:
+        session.write(Batch(data=sample_data.select("status", "id"), idx=1))
+
+    with duckdb.connect(sink.configuration.path) as conn:
+        df = conn.sql(f"SELECT * FROM {duckdb_identifier(table_name)}").pl()
+    assert df.columns == ["status", "id"]
+    assert df["status"].to_list() == ["new", "done"]
+
+
+@pytest.mark.unit
+def test_delta_lake_sink_session_keeps_table_loaded(
+    sample_data: pl.DataFrame,
+    sample_people_deltalake_sink_config: SinkConfiguration,
+) -> None:
+    with open_sink_session(sample_people_deltalake_sink_config) as session:
+        session.write(Batch(data=sample_data, idx=1))
+        table = session.table
+        session.write(Batch(data=sample_data, idx=2))
+
+        assert session.table is table
+        assert table.version() == 1
+
+    df = pl.read_delta(sample_people_deltalake_sink_config.configuration.path)
+    assert df.schema["status"] == pl.String
+    assert df.height == 4
+
+
+class FakeFuture:
+    def add_errback(self, callback) -> "FakeFuture":
+        return self
+
+
+class FakeProducer:
+    def __init__(self, **kwargs) -> None:
+        self.kwargs = kwargs
+        self.messages = []
+
+    def send(self, topic: str, key: bytes | None, value: bytes) -> FakeFuture:
+        self.messages.append((topic, key, value))
+        return FakeFuture()
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("message_format", ["json", "avro", "arrow"])
+def test_kafka_sink_session_encodes_messages(
+    sample_data: pl.DataFrame,
+    message_format: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr("mimicry.sinks.Producer", FakeProducer)
+    sink = SinkConfiguration(
+        configuration={
+            "type_of_sink": "kafka",
+            "topic": "events",
+            "producer_config": {"bootstrap_servers": "localhost:9092"},
+            "message_format": message_format,
+            "key_field": "id" if message_format == "json" else None,
+            "compression": "gzip",
+            "linger_ms": 5,
+        }
+    )
+
+    with open_sink_session(sink) as session:
+        producer = session.producer
+        session.write(Batch(data=sample_data, idx=1))
+
+    assert producer.kwargs == {
+        "bootstrap_servers": "localhost:9092",
+        "compression_type": "gzip",
+        "linger_ms": 5,
+    }
+    values = [value for _, _, value in producer.messages]
+    match message_format:
+        case "json":
+            assert [key for _, key, _ in producer.messages] == [b"1", b"2"]
+            assert [json.loads(value)["status"] for value in values] == ["new", "done"]
+        case "avro":
+            assert pl.read_avro(io.BytesIO(values[0])).equals(
+                sample_data.cast({"status": pl.String})
+            )
+        case "arrow":
+            table = pa.ipc.open_stream(values[0]).read_all()
+            assert table.column("status").to_pylist() == ["new", "done"]
+
+
+@pytest.mark.unit
+def test_kafka_sink_session_splits_batches_into_messages(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr("mimicry.sinks.Producer", FakeProducer)
+    sink = SinkConfiguration(
+        configuration={
+            "type_of_sink": "kafka",
+            "topic": "events",
+            "message_format": "arrow",
+            "max_records_per_message": 2,
+        }
+    )
+
+    with open_sink_session(sink) as session:
+        producer = session.producer
+        session.write(Batch(data=pl.DataFrame({"id": range(5)}), idx=1))
+
+    tables = [pa.ipc.open_stream(value).read_all() for _, _, value in producer.messages]
+    assert [table.column("id").to_pylist() for table in tables] == [[0, 1], [2, 3], [4]]
+
+
+class FailingFuture:
+    def __init__(self, errbacks: list) -> None:
+        self.errbacks = errbacks
+
+    def add_errback(self, callback) -> "FailingFuture":
+        self.errbacks.append(callback)
+        return self
+
+
+class FailingProducer(FakeProducer):
+    """Producer whose messages fail once they are flushed."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.errbacks = []
+
+    def send(self, topic: str, key: bytes | None, value: bytes) -> FailingFuture:
+        self.messages.append((topic, key, value))
+        return FailingFuture(self.errbacks)
+
+    def flush(self) -> None:
+        errbacks, self.errbacks = self.errbacks, []
+        for errback in errbacks:
+            errback(ConnectionError("The broker is unavailable"))
+
+
+@pytest.mark.unit
+def test_kafka_sink_session_raises_errors_of_the_last_messages(
+    sample_data: pl.DataFrame,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr("mimicry.sinks.Producer", FailingProducer)
+    sink = SinkConfiguration(configuration={"type_of_sink": "kafka", "topic": "events"})
+
+    with pytest.raises(ConnectionError), open_sink_session(sink) as session:
+        session.write(Batch(data=sample_data, idx=1))
+
+    assert len(session.errors) == 2
+    assert session.producer is None
+
+
+@pytest.mark.unit
+def test_kafka_sink_configuration_rejects_codecs_without_packages() -> None:
+    with pytest.raises(ValueError):
+        SinkConfiguration(
+            configuration={
+                "type_of_sink": "kafka",
+                "topic": "events",
+                "compression": "lz4",
+            }
+        )
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("dtype", "expected"),
+    [
+        (pl.Int16, "SMALLINT"),
+        (pl.UInt32, "BIGINT"),
+        (pl.Float64, "DOUBLE PRECISION"),
+        (pl.Decimal(10, 2), "NUMERIC(10, 2)"),
+        (pl.Enum(["new", "done"]), "TEXT"),
+        (pl.Datetime("us"), "TIMESTAMP"),
+        (pl.Datetime("us", "UTC"), "TIMESTAMPTZ"),
+        (pl.Date, "DATE"),
+    ],
+)
+def test_postgres_column_type(dtype: pl.DataType, expected: str) -> None:
+    assert postgres_column_type(dtype) == expected
+
+
+@pytest.mark.unit
+def test_postgres_column_type_rejects_nested_types() -> None:
+    with pytest.raises(ValueError):
+        postgres_column_type(pl.List(pl.Int64))
+
+
+@pytest.mark.unit
+def test_delta_lake_sink_session_maintains_table_in_background(
+    sample_data: pl.DataFrame,
+    tmp_path,
+) -> None:
+    path = str(tmp_path / "people")
+    sink = SinkConfiguration(
+        configuration={
+            "type_of_sink": "delta_lake",
+            "path": path,
+            "partition_by": ["status"],
+            "optimize": 4,
+            "vacuum": 1,
+            "vacuum_retention_hours": 0,
+        }
+    )
+
+    with open_sink_session(sink) as session:
+        session.write(Batch(data=sample_data, idx=1))
+        assert session.worker.task is None  # a file per partition
+        session.write(Batch(data=sample_data, idx=2))
+        assert session.worker.task is not None
+
+    table = DeltaTable(path)
+    assert table.metadata().partition_columns == ["status"]
+    assert len(table.files()) == 2
+    assert len(list((tmp_path / "people").rglob("*.parquet"))) == 2
+    assert pl.read_delta(path).height == 4
+
+
+@pytest.mark.unit
+def test_delta_lake_sink_session_vacuums_without_compaction(
+    sample_data: pl.DataFrame,
+    tmp_path,
+) -> None:
+    path = str(tmp_path / "people")
+    sink = SinkConfiguration(
+        configuration={"type_of_sink": "delta_lake", "path": path, "vacuum": 2}
+    )
+
+    with open_sink_session(sink) as session:
+        session.write(Batch(data=sample_data, idx=1))
+        assert session.worker.task is None
+        session.write(Batch(data=sample_data, idx=2))
+        assert session.worker.task is not None  # vacuum every 2 batches
+        assert session.batches == 0
+
+    assert pl.read_delta(path).height == 4
+
+
+@pytest.mark.unit
+def test_iceberg_sink_session_maintains_table_in_background(
+    sample_data: pl.DataFrame,
+    tmp_path,
+) -> None:
+    catalog_properties = {
+        "type": "sql",
+        "uri": f"sqlite:///{tmp_path / 'catalog.db'}",
+        "warehouse": f"file://{tmp_path / 'warehouse'}",
+    }
+    load_catalog("main", **catalog_properties).create_namespace("db")
+    sink = SinkConfiguration(
+        configuration={
+            "type_of_sink": "iceberg",
+            "table_name": "db.people",
+            "catalog_properties": catalog_properties,
+            "partition_by": [{"column": "status"}],
+            "sort_by": [{"column": "id", "descending": True}],
+            "compact": 2,
+            "expire_snapshots": 3,
+        }
+    )
+
+    with open_sink_session(sink) as session:
+        for idx in range(1, 3):
+            session.write(Batch(data=sample_data, idx=idx))
+            session.worker.executor.submit(lambda: None).result()
+
+    table = load_catalog("main", **catalog_properties).load_table("db.people")
+    assert [field.name for field in table.spec().fields] == ["status"]
+    assert table.sort_order().fields[0].direction == SortDirection.DESC
+    assert len(table.snapshots()) == 1
+    assert len(list(table.scan().plan_files())) == 2
+    assert len(list((tmp_path / "warehouse").rglob("*.parquet"))) == 2
+    assert table.scan().to_polars().sort("id")["id"].to_list() == [1, 1, 2, 2]
+
+
+@pytest.mark.unit
+def test_iceberg_sink_session_private_pyiceberg_api_is_unchanged() -> None:
+    # compaction, expiry and table creation rely on private pyiceberg APIs, which
+    # may change in any release: update the sink along with the pinned version
+    assert list(inspect.signature(_dataframe_to_data_files).parameters)[:3] == [
+        "table_metadata",
+        "df",
+        "io",
+    ]
+    schema = Catalog._convert_schema_if_needed(
+        pa.schema([("id", pa.int64()), ("status", pa.string())])
+    )
+    assert isinstance(schema, IcebergSchema)
+    assert assign_fresh_schema_ids(schema).find_field("status").field_id == 2
+    update = RemoveSnapshotsUpdate(snapshot_ids=[1])
+    assert update.action == "remove-snapshots"
+
+
+@pytest.mark.unit
+def test_coalescing_sink_session_writes_batches_together(
+    sample_data: pl.DataFrame,
+    sample_people_deltalake_sink_config: SinkConfiguration,
+) -> None:
+    now = 0.0
+    sink = sample_people_deltalake_sink_config.model_copy(
+        update={"buffer": SinkBufferConfiguration(max_rows=5, max_latency=10)}
+    )
+
+    with open_sink_session(sink) as session:
+        session.clock = lambda: now
+        for idx in range(1, 4):
+            session.write(Batch(data=sample_data, idx=idx))
+            session.flush()
+        assert session.writes == 1  # 6 records
+
+        session.write(Batch(data=sample_data, idx=4))
+        now = 10.0
+        session.flush()
+        assert session.writes == 2  # buffered for 10 seconds
+
+        session.write(Batch(data=sample_data, idx=5))
+
+    assert session.writes == 3
+    assert (
+        DeltaTable(sample_people_deltalake_sink_config.configuration.path).version()
+        == 2
+    )
+    assert (
+        pl.read_delta(sample_people_deltalake_sink_config.configuration.path).height
+        == 10
+    )
+
+
+@pytest.mark.unit
+def test_coalescing_sink_session_checks_the_latency_when_writing(
+    sample_data: pl.DataFrame,
+    sample_people_deltalake_sink_config: SinkConfiguration,
+) -> None:
+    now = 0.0
+    sink = sample_people_deltalake_sink_config.model_copy(
+        update={"buffer": SinkBufferConfiguration(max_latency=10)}
+    )
+
+    with open_sink_session(sink) as session:
+        session.clock = lambda: now
+        # the chunks of a batch are written without a flush in between
+        session.write(Batch(data=sample_data, idx=1))
+        now = 10.0
+        session.write(Batch(data=sample_data, idx=1))
+        assert session.writes == 1
+        assert session.rows == 0
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("file_format", "compression", "read"),
+    [
+        ("parquet", "zstd", pq.read_table),
+        ("ipc", "lz4", lambda path: pa.ipc.open_file(path).read_all()),
+        ("csv", "gzip", pacsv.read_csv),
+        ("ndjson", "zstd", pajson.read_json),
+    ],
+)
+def test_file_sink_session_rolls_files(
+    sample_data: pl.DataFrame,
+    file_format: str,
+    compression: str,
+    read,
+    tmp_path,
+) -> None:
+    sink = SinkConfiguration(
+        configuration={
+            "type_of_sink": "file",
+            "path": str(tmp_path / "people"),
+            "format": file_format,
+            "compression": compression,
+            "max_rows_per_file": 4,
+        }
+    )
+
+    with open_sink_session(sink) as session:
+        for idx in range(1, 4):
+            session.write(Batch(data=sample_data, idx=idx))
+
+    paths = sorted((tmp_path / "people").iterdir())
+    assert [path.name.split("-")[-1] for path in paths] == [
+        f"00000.{session.extension}",
+        f"00001.{session.extension}",
+    ]
+    tables = [read(str(path)) for path in paths]
+    assert [table.num_rows for table in tables] == [4, 2]
+    assert tables[0].column("status").to_pylist() == ["new", "done"] * 2
+
+
+@pytest.mark.unit
+def test_file_sink_configuration_rejects_unsupported_compression() -> None:
+    with pytest.raises(ValueError):
+        SinkConfiguration(
+            configuration={
+                "type_of_sink": "file",
+                "path": "data",
+                "format": "ipc",
+                "compression": "gzip",
+            }
+        )
+
+
+@pytest.mark.unit
+def test_fan_out_sink_session_writes_identical_data_to_all_sinks(
+    sample_data: pl.DataFrame,
+    sample_people_duckdb_sink_config: SinkConfiguration,
+    tmp_path,
+) -> None:
+    delta_sink_config = SinkConfiguration(
+        configuration={"type_of_sink": "delta_lake", "path": str(tmp_path / "delta")}
+    )
+    failing_sink_config = SinkConfiguration(
+        configuration={
+            "type_of_sink": "duckdb",
+            "path": str(tmp_path / "missing" / "people.db"),
+            "table_name": "people",
+        }
+    )
+    sink = SinkConfiguration(
+        configuration={
+            "type_of_sink": "fan_out",
+            "targets": [
+                sample_people_duckdb_sink_config,
+                failing_sink_config,
+                delta_sink_config,
+            ],
+        }
+    )
+
+    with open_sink_session(sink) as session:
+        for idx in range(1, 3):
+            session.write(Batch(data=sample_data, idx=idx))
+            session.flush()
+
+    assert [target.batches for target in session.targets] == [2, 0, 2]
+    assert session.targets[1].error is not None
+    with duckdb.connect(sample_people_duckdb_sink_config.configuration.path) as conn:
+        duckdb_data = conn.table("people").pl()
+    delta_data = pl.read_delta(delta_sink_config.configuration.path)
+    assert duckdb_data.equals(delta_data)
+    assert duckdb_data.height == 4
+
+    sink.configuration.isolate_errors = False
+    with pytest.raises(duckdb.IOException), open_sink_session(sink):
+        pass
+
+
+@pytest.mark.unit
+def test_fan_out_sink_session_encodes_batches_before_handing_them_over(
+    sample_data: pl.DataFrame,
+    tmp_path,
+) -> None:
+    sink = SinkConfiguration(
+        configuration={
+            "type_of_sink": "fan_out",
+            "targets": [
+                {
+                    "configuration": {
+                        "type_of_sink": "file",
+                        "path": str(tmp_path / "parquet"),
+                    }
+                },
+                {
+                    "configuration": {
+                        "type_of_sink": "fan_out",
+                        "targets": [
+                            {
+                                "configuration": {
+                                    "type_of_sink": "file",
+                                    "path": str(tmp_path / "ndjson"),
+                                    "format": "ndjson",
+                                }
+                            }
+                        ],
+                    }
+                },
+            ],
+        }
+    )
+    assert sink_batch_representations(sink) == {"arrow", "records"}
+    assert sink_batch_representations(sink.configuration.targets[0]) == {"arrow"}
+
+    batch = Batch(data=sample_data, idx=1)
+    with open_sink_session(sink) as session:
+        session.write(batch)
+
+    assert {"arrow", "records"} <= batch.__dict__.keys()
+    assert [target.batches for target in session.targets] == [1, 1]
+
+
+class FlakySinkSession(SinkSession):
+    """Sink kept in memory, whose writes fail a number of times."""
+
+    def __init__(self, written: list[pl.DataFrame], failures: list[int]) -> None:
+        self.written = written
+        self.failures = failures
+        self.closed_with: type[BaseException] | None = None
+
+    def write(self, batch: Batch) -> None:
+        if self.failures[0] > 0:
+            self.failures[0] -= 1
+            raise ConnectionError("The sink is unavailable")
+        self.written.append(batch.frame)
+
+    def __exit__(self, exc_type, *args) -> None:
+        self.closed_with = exc_type
+
+
+@pytest.mark.unit
+def test_spooling_sink_session_retries_batches_until_the_sink_recovers(
+    sample_data: pl.DataFrame,
+    tmp_path,
+) -> None:
+    written: list[pl.DataFrame] = []
+    sessions: list[FlakySinkSession] = []
+    failures = [2]
+
+    def factory() -> FlakySinkSession:
+        sessions.append(FlakySinkSession(written=written, failures=failures))
+        return sessions[-1]
+
+    config = SinkSpoolConfiguration(directory=str(tmp_path), retry_backoff=0.01)
+    with SpoolingSinkSession(factory=factory, config=config) as session:
+        for idx in range(1, 4):
+            session.write(Batch(data=sample_data, idx=idx))
+            session.flush()
+
+    assert session.replayed == 3
+    assert session.retries == 2
+    assert [session.closed_with for session in sessions] == [
+        ConnectionError,
+        ConnectionError,
+        None,
+    ]
+    assert pl.concat(written).equals(
+        pl.concat([Batch(data=sample_data, idx=1).frame] * 3)
+    )
+    assert list(tmp_path.iterdir()) == []
+
+    failures[0] = 1
+    config.max_retries = 0
+    with (
+        pytest.raises(ConnectionError),
+        SpoolingSinkSession(factory=factory, config=config) as session,
+    ):
+        session.write(Batch(data=sample_data, idx=1))
+        session.flush()
+        session.drainer.exception()  # the retries are exhausted
+        session.write(Batch(data=sample_data, idx=2))
+    assert len(list(tmp_path.glob("*.arrow"))) == 1
+
+
+@pytest.mark.unit
+def test_spooling_sink_session_replays_batches_after_restart(
+    sample_data: pl.DataFrame,
+    tmp_path,
+) -> None:
+    written: list[pl.DataFrame] = []
+    failures = [1_000]
+    config = SinkSpoolConfiguration(directory=str(tmp_path), max_retries=None)
+
+    def factory() -> FlakySinkSession:
+        return FlakySinkSession(written=written, failures=failures)
+
+    with (
+        pytest.raises(KeyboardInterrupt),
+        SpoolingSinkSession(factory=factory, config=config) as session,
+    ):
+        for idx in range(1, 3):
+            session.write(Batch(data=sample_data, idx=idx))
+            session.flush()
+        session.write(Batch(data=sample_data, idx=3))
+        raise KeyboardInterrupt
+
+    assert session.depth == 3
+    assert session.max_depth == 3
+    assert written == []
+
+    failures[0] = 0
+    with SpoolingSinkSession(factory=factory, config=config) as session:
+        pass
+
+    assert session.replayed == 3
+    assert pl.concat(written).height == 3 * sample_data.height
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+
+from mimicry.utils import prefetch
+
+
+@pytest.mark.unit
+def test_prefetch_yields_all_items_in_order() -> None:
+    assert list(prefetch(range(10), depth=2)) == list(range(10))
+
+
+@pytest.mark.unit
+def test_prefetch_applies_backpressure() -> None:
+    produced = []
+
+    def items():
+        for idx in range(10):
+            produced.append(idx)
+            yield idx
+
+    iterator = prefetch(items(), depth=2)
+    assert next(iterator) == 0
+    time.sleep(0.3)
+
+    # one item consumed, two buffered and one waiting to be put into the buffer
+    assert len(produced) <= 4
+    iterator.close()
+
+
+@pytest.mark.unit
+def test_prefetch_reraises_producer_errors() -> None:
+    def items():
+        yield 1
+        raise RuntimeError("generation failed")
+
+    with pytest.raises(RuntimeError, match="generation failed"):
+        list(prefetch(items(), depth=2))
+
+
+@pytest.mark.unit
+def test_prefetch_stops_producer_when_consumer_stops() -> None:
+    iterator = prefetch(iter(range(1000)), depth=1)
+    next(iterator)
+    iterator.close()
+
+    assert not any(
+        thread.name == "mimicry-prefetch" for thread in threading.enumerate()
+    )
@@ -0,0 +1,89 @@
+import uuid
+from datetime import datetime
+
+import numpy as np
+import polars as pl
+import pytest
+
+from mimicry.generator import TableGenerator
+from mimicry.models import FieldConfiguration, TableConfiguration
+from mimicry.vectorized import VECTORIZED_GENERATORS, get_vectorized_generator
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    return np.random.default_rng(42)
+
+
+@pytest.mark.unit
+def test_integer_number_honors_inclusive_range(rng: np.random.Generator) -> None:
+    series = VECTORIZED_GENERATORS["numeric.integer_number"](rng, 1000, start=1, end=3)
+
+    assert series.dtype == pl.Int64
+    assert set(series.unique().to_list()) == {1, 2, 3}
+
+
+@pytest.mark.unit
+def test_price_honors_range_and_precision(rng: np.random.Generator) -> None:
+    series = VECTORIZED_GENERATORS["finance.price"](
+        rng, 1000, minimum=5.0, maximum=10.0
+    )
+
+    assert series.dtype == pl.Float64
+    assert series.min() >= 5.0
+    assert series.max() <= 10.0
+    assert (series.round(2) == series).all()
+
+
+@pytest.mark.unit
+def test_datetime_honors_year_range(rng: np.random.Generator) -> None:
+    series = VECTORIZED_GENERATORS["datetime.datetime"](rng, 1000, start=2023, end=2024)
+
+    assert series.dtype == pl.Datetime("us")
+    assert series.min() >= datetime(2023, 1, 1)
+    assert series.max() < datetime(2025, 1, 1)
+
+
+@pytest.mark.unit
+def test_uuid_generates_valid_uuid4_strings(rng: np.random.Generator) -> None:
+    series = VECTORIZED_GENERATORS["cryptographic.uuid"](rng, 1000)
+
+    assert series.dtype == pl.String
+    assert series.n_unique() == 1000
+    for value in series.to_list():
+        assert str(uuid.UUID(value)) == value
+        assert uuid.UUID(value).version == 4
+
+
+@pytest.mark.unit
+def test_table_generator_falls_back_to_mimesis_for_unsupported_kwargs() -> None:
+    table = TableConfiguration(
+        name="events",
+        description="Events with timezone-aware timestamps.",
+        fields=[
+            FieldConfiguration(
+                name="created_at",
+                description="Creation timestamp.",
+                mimesis_field_name="datetime.datetime",
+                mimesis_field_kwargs={"timezone": "UTC"},
+            ),
+        ],
+    )
+
+    df = TableGenerator(table=table, strict=True).generate(count=10)
+
+    assert df.schema["created_at"] == pl.Datetime("us", "UTC")
+
+
+@pytest.mark.unit
+def test_choice_is_vectorized_only_for_single_items() -> None:
+    items = ["a", "b"]
+
+    assert get_vectorized_generator("choice.choice", {"items": items}) is not None
+    assert (
+        get_vectorized_generator("choice.choice", {"items": items, "length": 2}) is None
+    )
+    assert (
+        get_vectorized_generator("choice.choice", {"items": items, "unique": True})
+        is None
+    )